@@ -0,0 +1,234 @@
+"""
+This module records user activities without writing to the database in the request path.
+
+record() only puts the activity on a bounded in-memory queue. A background
+thread takes the activities off the queue and writes them with the copy
+loader, once flush_size activities are waiting or flush_interval seconds
+have passed. A full queue makes callers wait for at most enqueue_timeout
+seconds and then drops the activity, so a slow database cannot stall
+requests. Whatever is still queued is written when the process exits.
+A batch whose write fails is retried once on a fresh connection.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from account.loaders import copy_rows
+
+logger = logging.getLogger(__name__)
+
+# columns written for every activity
+ACTIVITY_FIELDS = ["user_id", "activity_type", "timestamp"]
+
+# number of times a batch is written before it is counted as failed
+WRITE_ATTEMPTS = 2
+
+
+class ActivityWriter:
+    """
+    Buffer activities in a bounded queue and write them in batches.
+
+    Attributes:
+        written (int): Number of activities written.
+        dropped (int): Number of activities dropped because the queue was full.
+        failed (int): Number of activities lost because a write failed.
+    """
+
+    def __init__(self, max_buffer=10000, flush_size=500, flush_interval=2.0, enqueue_timeout=0.05,
+                 background=True, using="default", retry_delay=0.5):
+        """
+        Args:
+            max_buffer (int, optional): Maximum number of queued activities.
+            flush_size (int, optional): Number of activities that triggers a write.
+            flush_interval (float, optional): Seconds after which queued activities are written anyway.
+            enqueue_timeout (float, optional): Seconds record() waits on a full queue before dropping.
+            background (bool, optional): Write from a background thread. Without it record()
+                writes in the caller's thread once flush_size activities are queued.
+            using (str, optional): The database alias.
+            retry_delay (float, optional): Seconds to wait before a failed batch is written again.
+        """
+        self.queue = queue.Queue(maxsize=max_buffer)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.background = background
+        self.using = using
+        self.retry_delay = retry_delay
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.stopping = threading.Event()
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Create a writer configured by the ACTIVITY_* settings.
+        """
+        return cls(
+            max_buffer=getattr(settings, "ACTIVITY_BUFFER_SIZE", 10000),
+            flush_size=getattr(settings, "ACTIVITY_FLUSH_SIZE", 500),
+            flush_interval=getattr(settings, "ACTIVITY_FLUSH_INTERVAL", 2.0),
+            enqueue_timeout=getattr(settings, "ACTIVITY_ENQUEUE_TIMEOUT", 0.05),
+            background=getattr(settings, "ACTIVITY_BACKGROUND_WRITER", True),
+        )
+
+    def record(self, user_id, activity_type, timestamp=None):
+        """
+        Queue an activity.
+
+        Args:
+            user_id (int): Primary key of the user.
+            activity_type (str): The activity, for example "login".
+            timestamp (datetime, optional): When it happened, defaults to now.
+
+        Returns:
+            bool: False if the activity was dropped because the queue stayed full.
+        """
+        try:
+            self.queue.put((user_id, activity_type, timestamp or timezone.now()), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logger.warning("Activity queue is full, dropped %s activity of user %s", activity_type, user_id)
+            return False
+        if self.background:
+            self.ensure_thread()
+        elif self.queue.qsize() >= self.flush_size:
+            self.flush()
+        return True
+
+    def ensure_thread(self):
+        """
+        Start the flush thread, again after a fork because threads do not survive it.
+        """
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name="activity-writer", daemon=True)
+            self.thread.start()
+
+    def take(self, limit, timeout=None):
+        """
+        Take up to limit activities off the queue.
+
+        Args:
+            limit (int): Maximum number of activities.
+            timeout (float, optional): Seconds to wait for the batch to fill, None to not wait.
+
+        Returns:
+            list: The activities.
+        """
+        batch = []
+        deadline = time.monotonic() + timeout if timeout else None
+        while len(batch) < limit:
+            try:
+                if deadline is None:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch, refresh_connection=False):
+        """
+        Write a batch of activities. A batch that still fails after WRITE_ATTEMPTS is logged and counted.
+
+        Args:
+            batch (list): Activity tuples in the order of ACTIVITY_FIELDS.
+            refresh_connection (bool, optional): Replace a broken or expired connection
+                before every attempt, like Django does between requests.
+        """
+        from account.models import Activity
+
+        if not batch:
+            return
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            if refresh_connection:
+                connections[self.using].close_if_unusable_or_obsolete()
+            try:
+                copy_rows(Activity, ACTIVITY_FIELDS, batch, chunk_size=len(batch), using=self.using)
+            except Exception:
+                if attempt < WRITE_ATTEMPTS:
+                    logger.warning("Could not write %s activities, retrying", len(batch), exc_info=True)
+                    time.sleep(self.retry_delay)
+                    continue
+                with self.lock:
+                    self.failed += len(batch)
+                logger.exception("Could not write %s activities", len(batch))
+                return
+            with self.lock:
+                self.written += len(batch)
+            return
+
+    def run(self):
+        """
+        Body of the flush thread.
+
+        No request_finished signal fires in this thread, so the connection is
+        checked before every write and replaced after a database restart.
+        """
+        try:
+            while not self.stopping.is_set():
+                self.write(self.take(self.flush_size, timeout=self.flush_interval), refresh_connection=True)
+        finally:
+            # the thread opened its own connection
+            connections[self.using].close()
+
+    def flush(self):
+        """
+        Write every queued activity in the caller's thread.
+
+        Returns:
+            int: Number of activities taken off the queue.
+        """
+        taken = 0
+        while True:
+            batch = self.take(self.flush_size)
+            if not batch:
+                return taken
+            self.write(batch)
+            taken += len(batch)
+
+    def close(self, timeout=5):
+        """
+        Stop the flush thread and write what is left. Registered to run at exit.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the flush thread.
+        """
+        self.stopping.set()
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            self.thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """
+        Return the queue length and the written, dropped and failed counters.
+        """
+        with self.lock:
+            return {
+                "queued": self.queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+# writer used by the signal handlers, flushed when the interpreter exits
+activity_writer = ActivityWriter.from_settings()
+atexit.register(activity_writer.close)
@@ -0,0 +1,343 @@
+"""
+This module contains helpers for copying legacy users into the new user table.
+
+The helpers work with the model classes passed in by the caller, so they can be
+used from data migrations (historical models) as well as from management commands.
+"""
+import logging
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from account.manager import provision_profiles
+
+logger = logging.getLogger("account.migrations")
+
+# fallback batch size when USER_MIGRATION_BATCH_SIZE is not configured
+DEFAULT_BATCH_SIZE = 1000
+
+# table holding the last copied primary key of each copy step
+CHECKPOINT_TABLE = "account_migration_checkpoint"
+
+# legacy user columns that are copied verbatim into the new user table
+USER_COPY_FIELDS = [
+    "email",
+    "username",
+    "full_name",
+    "password",
+    "phone_number",
+    "date_of_birth",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+]
+
+
+def log_skipped(usernames):
+    """
+    Warn about legacy users that were not copied because their username or email is taken.
+
+    Args:
+        usernames (list): Usernames of the skipped legacy users.
+    """
+    if usernames:
+        logger.warning(
+            "%s legacy users were not copied because their username or email already exists: %s",
+            len(usernames),
+            ", ".join(usernames),
+        )
+
+
+class NullProgress:
+    """
+    Progress stand-in used when the caller does not collect metrics.
+    """
+
+    def batch(self, rows):
+        """
+        Return a context manager that does nothing.
+        """
+        return nullcontext()
+
+
+def get_batch_size(batch_size=None):
+    """
+    Return the batch size to use for copying users.
+
+    Args:
+        batch_size (int, optional): Explicit batch size that overrides the setting.
+
+    Returns:
+        int: The batch size.
+    """
+    if batch_size:
+        return batch_size
+    return getattr(settings, "USER_MIGRATION_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+
+def iter_old_user_batches(old_user, batch_size, start_pk=0, end_pk=None, using="default"):
+    """
+    Yield legacy users in primary key order, one batch at a time.
+
+    Keyset pagination on the primary key is used instead of OFFSET so every
+    batch is an index range scan and only one batch is held in memory.
+
+    Args:
+        old_user (Model): The legacy user model.
+        batch_size (int): Number of rows per batch.
+        start_pk (int, optional): Only rows with a primary key greater than this are read.
+        end_pk (int, optional): Only rows with a primary key up to this are read.
+        using (str, optional): The database alias.
+
+    Yields:
+        list: A list of dicts with the "id" and USER_COPY_FIELDS of each row.
+    """
+    last_pk = start_pk
+    while True:
+        queryset = old_user.objects.using(using).filter(pk__gt=last_pk)
+        if end_pk is not None:
+            queryset = queryset.filter(pk__lte=end_pk)
+        batch = list(queryset.order_by("pk").values("id", *USER_COPY_FIELDS)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]["id"]
+
+
+def iter_old_user_pk_batches(old_user, batch_size, start_pk=0, end_pk=None, using="default"):
+    """
+    Yield the primary key bounds of consecutive batches of legacy users.
+
+    Only the primary keys are read, so the rows themselves never leave the database.
+
+    Args:
+        old_user (Model): The legacy user model.
+        batch_size (int): Number of rows per batch.
+        start_pk (int, optional): Only rows with a primary key greater than this are read.
+        end_pk (int, optional): Only rows with a primary key up to this are read.
+        using (str, optional): The database alias.
+
+    Yields:
+        tuple: (start_pk, end_pk, rows) where start_pk is exclusive and end_pk inclusive.
+    """
+    last_pk = start_pk
+    while True:
+        queryset = old_user.objects.using(using).filter(pk__gt=last_pk)
+        if end_pk is not None:
+            queryset = queryset.filter(pk__lte=end_pk)
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        yield last_pk, pks[-1], len(pks)
+        last_pk = pks[-1]
+
+
+def ensure_checkpoint_table(using="default"):
+    """
+    Create the checkpoint table if it does not exist yet.
+
+    The table is created with plain SQL instead of a model so that it is
+    available to data migrations that run before any later schema migration.
+
+    Args:
+        using (str, optional): The database alias.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ("
+            "step varchar(100) PRIMARY KEY, "
+            "last_pk bigint NOT NULL, "
+            "updated_at timestamp NOT NULL)"
+        )
+
+
+def get_checkpoint(step, using="default"):
+    """
+    Return the last copied primary key for a copy step.
+
+    Args:
+        step (str): Name of the copy step.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: The last copied primary key, or 0 if the step has not started.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT last_pk FROM {CHECKPOINT_TABLE} WHERE step = %s", [step])
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def save_checkpoint(step, last_pk, using="default"):
+    """
+    Store the last copied primary key for a copy step.
+
+    Args:
+        step (str): Name of the copy step.
+        last_pk (int): The last copied primary key.
+        using (str, optional): The database alias.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {CHECKPOINT_TABLE} (step, last_pk, updated_at) VALUES (%s, %s, %s) "
+            "ON CONFLICT (step) DO UPDATE SET last_pk = excluded.last_pk, updated_at = excluded.updated_at",
+            [step, last_pk, timezone.now().replace(tzinfo=None)],
+        )
+
+
+def copy_user_batch(rows, new_user, new_user_profile, using="default"):
+    """
+    Copy one batch of legacy user rows into the new user table and create their profiles.
+
+    Rows whose username was already copied and users that already have a
+    profile are skipped, so copying the same batch twice is a no-op. Rows
+    whose email belongs to another new user are skipped and logged.
+
+    Args:
+        rows (list): Legacy user rows as returned by iter_old_user_batches.
+        new_user (Model): The new user model.
+        new_user_profile (Model): The profile model.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: Number of rows in the batch.
+    """
+    usernames = [row["username"] for row in rows]
+    copied = set(
+        new_user.objects.using(using).filter(username__in=usernames).values_list("username", flat=True)
+    )
+    new_users = [
+        new_user(**{field: row[field] for field in USER_COPY_FIELDS})
+        for row in rows if row["username"] not in copied
+    ]
+    # the legacy email is not unique, a duplicate must not fail the batch
+    new_user.objects.using(using).bulk_create(new_users, batch_size=len(rows), ignore_conflicts=True)
+    copied = set(
+        new_user.objects.using(using).filter(username__in=usernames).values_list("username", flat=True)
+    )
+    log_skipped([username for username in usernames if username not in copied])
+
+    # select the new users by username so this works on backends
+    # that cannot return ids from a bulk insert
+    provision_profiles(new_user_profile, new_user.objects.using(using).filter(username__in=usernames), using)
+    return len(rows)
+
+
+def copy_user_range_sql(start_pk, end_pk, old_user, new_user, new_user_profile, using="default"):
+    """
+    Copy a primary key range of legacy users with set-based INSERT ... SELECT statements.
+
+    The rows are copied inside the database without passing through Python
+    model instances, so phone numbers are copied verbatim. Usernames that
+    were already copied and users that already have a profile are skipped.
+    The legacy email is not unique, rows whose email belongs to another new
+    user are skipped and logged instead of failing the range.
+
+    Args:
+        start_pk (int): Exclusive lower bound of the range.
+        end_pk (int): Inclusive upper bound of the range.
+        old_user (Model): The legacy user model.
+        new_user (Model): The new user model.
+        new_user_profile (Model): The profile model.
+        using (str, optional): The database alias.
+
+    Returns:
+        list: Usernames of the legacy users in the range that were skipped.
+    """
+    connection = connections[using]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    old_table = old_user._meta.db_table
+    new_table = new_user._meta.db_table
+    profile_table = new_user_profile._meta.db_table
+    columns = ", ".join(USER_COPY_FIELDS)
+    select_columns = ", ".join(f"u.{field}" for field in USER_COPY_FIELDS)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {new_table} ({columns}, joined_at, updated_at) "
+            f"SELECT {select_columns}, %s, %s FROM {old_table} u "
+            "WHERE u.id > %s AND u.id <= %s ORDER BY u.id "
+            # a conflict on either username or email skips the row
+            "ON CONFLICT DO NOTHING",
+            [now, now, start_pk, end_pk],
+        )
+        cursor.execute(
+            f"INSERT INTO {profile_table} (user_id, updated_at) "
+            f"SELECT n.id, %s FROM {old_table} u "
+            f"JOIN {new_table} n ON n.username = u.username "
+            "WHERE u.id > %s AND u.id <= %s "
+            f"AND NOT EXISTS (SELECT 1 FROM {profile_table} p WHERE p.user_id = n.id)",
+            [now, start_pk, end_pk],
+        )
+        cursor.execute(
+            f"SELECT u.username FROM {old_table} u WHERE u.id > %s AND u.id <= %s "
+            f"AND NOT EXISTS (SELECT 1 FROM {new_table} n WHERE n.username = u.username) ORDER BY u.id",
+            [start_pk, end_pk],
+        )
+        skipped = [username for username, in cursor.fetchall()]
+    log_skipped(skipped)
+    return skipped
+
+
+def copy_users(old_user, new_user, new_user_profile, step, batch_size=None,
+               start_pk=0, end_pk=None, using="default", fast_path=None, progress=None,
+               create_checkpoint_table=True):
+    """
+    Copy legacy users in checkpointed batches.
+
+    Each batch is committed in its own transaction together with its
+    checkpoint, so a rerun after a failure resumes after the last committed
+    batch instead of starting from the beginning.
+
+    On PostgreSQL every batch is copied with server side INSERT ... SELECT
+    statements, other backends copy the rows through the ORM.
+
+    Args:
+        old_user (Model): The legacy user model.
+        new_user (Model): The new user model.
+        new_user_profile (Model): The profile model.
+        step (str): Name of the copy step used as checkpoint key.
+        batch_size (int, optional): Number of rows per batch.
+        start_pk (int, optional): Only rows with a primary key greater than this are copied.
+        end_pk (int, optional): Only rows with a primary key up to this are copied.
+        using (str, optional): The database alias.
+        fast_path (bool, optional): Force the INSERT ... SELECT path on or off.
+            Defaults to on for PostgreSQL only.
+        progress (MigrationProgress, optional): Receives the metrics of every batch.
+        create_checkpoint_table (bool, optional): Create the checkpoint table if missing.
+            Parallel callers create it once up front and pass False.
+
+    Returns:
+        int: Number of rows processed by this run.
+    """
+    batch_size = get_batch_size(batch_size)
+    if create_checkpoint_table:
+        ensure_checkpoint_table(using)
+    start_pk = max(start_pk, get_checkpoint(step, using))
+    if fast_path is None:
+        fast_path = connections[using].vendor == "postgresql"
+    if progress is None:
+        progress = NullProgress()
+    else:
+        pending = old_user.objects.using(using).filter(pk__gt=start_pk)
+        if end_pk is not None:
+            pending = pending.filter(pk__lte=end_pk)
+        progress.start(pending.count())
+
+    total = 0
+    if fast_path:
+        for batch_start, batch_end, rows in iter_old_user_pk_batches(
+                old_user, batch_size, start_pk, end_pk, using):
+            with progress.batch(rows), transaction.atomic(using=using):
+                copy_user_range_sql(batch_start, batch_end, old_user, new_user, new_user_profile, using)
+                save_checkpoint(step, batch_end, using)
+            total += rows
+        return total
+
+    for rows in iter_old_user_batches(old_user, batch_size, start_pk, end_pk, using):
+        with progress.batch(len(rows)), transaction.atomic(using=using):
+            total += copy_user_batch(rows, new_user, new_user_profile, using)
+            save_checkpoint(step, rows[-1]["id"], using)
+    return total
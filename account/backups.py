@@ -0,0 +1,129 @@
+"""
+This module contains helpers shared by the backup commands.
+"""
+import os
+import shutil
+
+from django.utils import timezone
+
+# prefixes of the timestamped pg_dump backup and table export directories,
+# followed by the creation time. Pruning one kind never touches the other.
+BACKUP_PREFIX = "backup-"
+EXPORT_PREFIX = "export-"
+BACKUP_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S"
+
+# pg_dump output formats and the file name used for each of them
+DUMP_FORMATS = {
+    "plain": "backup_sql_postgres.sql",
+    "custom": "backup_sql_postgres.dump",
+    "directory": "backup_sql_postgres",
+}
+
+
+def build_pg_dump_command(database, output, dump_format="plain", jobs=1, compress=None):
+    """
+    Build the pg_dump command line for a database.
+
+    Args:
+        database (dict): The database settings.
+        output (str): Path of the dump file, or directory for the directory format.
+        dump_format (str, optional): One of DUMP_FORMATS.
+        jobs (int, optional): Number of tables dumped in parallel, directory format only.
+        compress (int, optional): Compression level from 0 to 9.
+
+    Returns:
+        list: The command line.
+
+    Raises:
+        ValueError: If parallel jobs are requested for a format other than directory.
+    """
+    if jobs > 1 and dump_format != "directory":
+        raise ValueError("Parallel jobs require the directory format")
+    command = [
+        'pg_dump',
+        '-U', database['USER'],
+        '-d', database['NAME'],
+        '--host', database['HOST'],
+        '--port', str(database['PORT']),
+        '-F', dump_format[0],
+        '-f', output,
+    ]
+    if jobs > 1:
+        command += ['-j', str(jobs)]
+    if compress is not None:
+        command += ['-Z', str(compress)]
+    return command
+
+
+def timestamped_dir(root, now=None, prefix=BACKUP_PREFIX):
+    """
+    Return a new backup directory named after the current time.
+
+    Args:
+        root (str): Directory holding all backups.
+        now (datetime, optional): The creation time.
+        prefix (str, optional): BACKUP_PREFIX or EXPORT_PREFIX.
+
+    Returns:
+        str: Path of the backup directory.
+    """
+    now = now or timezone.now()
+    return os.path.join(root, f"{prefix}{now:{BACKUP_TIMESTAMP_FORMAT}}")
+
+
+def list_backups(root, prefix=BACKUP_PREFIX):
+    """
+    Return the timestamped backup directories in root, oldest first.
+
+    Args:
+        root (str): Directory holding all backups.
+        prefix (str, optional): Only directories with this prefix are listed.
+
+    Returns:
+        list: Paths of the backup directories.
+    """
+    if not os.path.isdir(root):
+        return []
+    names = sorted(
+        name for name in os.listdir(root)
+        if name.startswith(prefix) and os.path.isdir(os.path.join(root, name))
+    )
+    return [os.path.join(root, name) for name in names]
+
+
+def prune_backups(root, keep, prefix=BACKUP_PREFIX):
+    """
+    Delete the oldest timestamped backups so that only keep are left.
+
+    Args:
+        root (str): Directory holding all backups.
+        keep (int): Number of backups to keep.
+        prefix (str, optional): Only directories with this prefix are counted and deleted.
+
+    Returns:
+        list: Paths of the deleted backups.
+    """
+    backups = list_backups(root, prefix)
+    expired = backups[:max(len(backups) - keep, 0)]
+    for path in expired:
+        shutil.rmtree(path)
+    return expired
+
+
+def path_size(path):
+    """
+    Return the size of a file or of all files below a directory.
+
+    Args:
+        path (str): A file or directory.
+
+    Returns:
+        int: Size in bytes.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
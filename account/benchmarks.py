@@ -0,0 +1,365 @@
+"""
+This module contains the scenarios of the benchmark command.
+
+Every scenario runs against a dataset of a given number of users and is
+measured for wall time, query count and peak python memory. Tracing
+allocations slows python down several times, so the peak memory is taken
+in a separate run that is rolled back before the timed run. The results
+are collected in a JSON report, so runs on different commits can be compared.
+"""
+import datetime
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.contrib import admin
+from django.db import connections, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from account.backfill import copy_users
+from account.loaders import copy_rows
+from account.models import NewUser, Profile, User as LegacyUser
+from account.seeding import PasswordFactory, UserDataGenerator, load_users, next_sequence_start
+from notification.fanout import fan_out
+
+# number of users in the datasets measured by default
+DEFAULT_SCALES = [10000, 100000, 1000000]
+
+# legacy user columns written when preparing the 0003 copy scenario
+LEGACY_LOAD_FIELDS = [
+    "username",
+    "email",
+    "full_name",
+    "date_of_birth",
+    "phone_number",
+    "password",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+]
+
+
+class Measurement:
+    """
+    Wall time, query count and peak python memory of one scenario run.
+
+    Attributes:
+        scenario (str): Name of the scenario.
+        users (int): Number of users in the dataset.
+        operations (int): Number of operations performed, for example lookups.
+        seconds (float): Wall time of the run.
+        queries (int): Number of queries executed.
+        peak_memory (int): Peak memory allocated by python, in bytes.
+    """
+
+    def __init__(self, scenario, users):
+        self.scenario = scenario
+        self.users = users
+        self.operations = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.peak_memory = 0
+
+    def _count_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper that counts queries.
+        """
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def as_dict(self):
+        """
+        Return the measurement as a JSON serializable dict.
+        """
+        return {
+            "scenario": self.scenario,
+            "users": self.users,
+            "operations": self.operations,
+            "seconds": round(self.seconds, 6),
+            "seconds_per_operation": round(self.seconds / self.operations, 6) if self.operations else None,
+            "queries": self.queries,
+            "peak_memory": self.peak_memory,
+        }
+
+
+@contextmanager
+def measure(scenario, users, using="default"):
+    """
+    Measure the wall time and queries of the block as one run of a scenario.
+
+    Args:
+        scenario (str): Name of the scenario.
+        users (int): Number of users in the dataset.
+        using (str, optional): The database alias whose queries are counted.
+
+    Yields:
+        Measurement: Filled in when the block exits. The block may set operations.
+    """
+    measurement = Measurement(scenario, users)
+    started = time.perf_counter()
+    try:
+        with connections[using].execute_wrapper(measurement._count_query):
+            yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+
+
+def peak_memory(run, scenario, users, using="default"):
+    """
+    Return the peak python memory of one run of a scenario.
+
+    The run happens in a transaction that is rolled back, so the data is
+    unchanged for the timed run that follows.
+
+    Args:
+        run (callable): Called with a Measurement, runs the measured part of the scenario.
+        scenario (str): Name of the scenario.
+        users (int): Number of users in the dataset.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: Peak memory allocated by python, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        with transaction.atomic(using=using):
+            run(Measurement(scenario, users))
+            transaction.set_rollback(True, using=using)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BenchmarkSuite:
+    """
+    Run the benchmark scenarios against a dataset of a given size.
+
+    The seed scenario must run first, every other scenario works on the
+    users it loaded.
+    """
+
+    SCENARIOS = [
+        "seed",
+        "copy_0003",
+        "lookup_username",
+        "lookup_email",
+        "birthdays",
+        "notification_fanout",
+        "admin_changelist",
+    ]
+
+    def __init__(self, users, lookups=1000, batch_size=10000, seed=None, using="default"):
+        """
+        Args:
+            users (int): Number of users in the dataset.
+            lookups (int, optional): Number of single user lookups measured.
+            batch_size (int, optional): Number of rows loaded per batch.
+            seed (int, optional): Seed for reproducible data.
+            using (str, optional): The database alias.
+        """
+        self.users = users
+        self.lookups = lookups
+        self.batch_size = batch_size
+        self.random_seed = seed
+        self.using = using
+        self.random = random.Random(seed)
+        self.sample = []
+
+    def run(self, scenarios=None):
+        """
+        Run the scenarios in order.
+
+        Args:
+            scenarios (list, optional): Names of the scenarios, defaults to all.
+
+        Returns:
+            list: One Measurement per scenario.
+        """
+        results = []
+        for scenario in scenarios or self.SCENARIOS:
+            results.append(getattr(self, scenario)())
+        return results
+
+    def measure_scenario(self, scenario, run):
+        """
+        Measure a scenario, peak memory and wall time in separate runs.
+
+        Args:
+            scenario (str): Name of the scenario.
+            run (callable): Called with a Measurement, runs the measured part of the scenario.
+                It is called twice and must start from the same state both times.
+
+        Returns:
+            Measurement: The measurement of the timed run.
+        """
+        memory = peak_memory(run, scenario, self.users, self.using)
+        with measure(scenario, self.users, self.using) as measurement:
+            run(measurement)
+        measurement.peak_memory = memory
+        return measurement
+
+    def seed(self):
+        """
+        Load the users and their profiles with the copy loader.
+        """
+        def run(measurement):
+            generator = UserDataGenerator(seed=self.random_seed, start=next_sequence_start(NewUser), namespace="b")
+            passwords = PasswordFactory(mode="once")
+            self.random = random.Random(self.random_seed)
+            self.sample = []
+            for rows in generator.batches(self.users, self.batch_size):
+                load_users(rows, passwords.hashes(len(rows)), chunk_size=self.batch_size, using=self.using)
+                # keep a reservoir of users for the lookup scenarios
+                for row in rows:
+                    if len(self.sample) < self.lookups:
+                        self.sample.append(row)
+                    else:
+                        index = self.random.randrange(measurement.operations + 1)
+                        if index < self.lookups:
+                            self.sample[index] = row
+                    measurement.operations += 1
+
+        return self.measure_scenario("seed", run)
+
+    def copy_0003(self):
+        """
+        Copy legacy users into the new user table like the 0003 data migration.
+
+        Loading the legacy users is not part of the measurement.
+        """
+        generator = UserDataGenerator(seed=self.random_seed, start=next_sequence_start(LegacyUser), namespace="l")
+        password = PasswordFactory(mode="once").hashes(1)[0]
+        start_pk = next_sequence_start(LegacyUser) - 1
+        for rows in generator.batches(self.users, self.batch_size):
+            copy_rows(
+                LegacyUser,
+                LEGACY_LOAD_FIELDS,
+                ([row[field] for field in LEGACY_LOAD_FIELDS[:5]] + [password, True, False, False] for row in rows),
+                chunk_size=self.batch_size,
+                using=self.using,
+            )
+
+        def run(measurement):
+            step = f"benchmark.copy_users.{timezone.now():%Y%m%dT%H%M%S%f}"
+            measurement.operations = copy_users(
+                LegacyUser, NewUser, Profile, step, start_pk=start_pk, using=self.using
+            )
+
+        return self.measure_scenario("copy_0003", run)
+
+    def lookup_username(self):
+        """
+        Fetch sampled users one by one by username.
+        """
+        def run(measurement):
+            for row in self.sample:
+                NewUser.objects.using(self.using).get(username=row["username"])
+                measurement.operations += 1
+
+        return self.measure_scenario("lookup_username", run)
+
+    def lookup_email(self):
+        """
+        Fetch sampled users one by one by email.
+        """
+        def run(measurement):
+            for row in self.sample:
+                NewUser.objects.using(self.using).get(email=row["email"])
+                measurement.operations += 1
+
+        return self.measure_scenario("lookup_email", run)
+
+    def birthdays(self):
+        """
+        Fetch the users having their birthday on each day of one month.
+        """
+        def run(measurement):
+            for day in range(1, 32):
+                for batch in NewUser.objects.db_manager(self.using).iter_birthday_batches(
+                    datetime.date(2023, 1, day), batch_size=self.batch_size
+                ):
+                    measurement.operations += len(batch)
+
+        return self.measure_scenario("birthdays", run)
+
+    def notification_fanout(self):
+        """
+        Send one notification to every active user.
+        """
+        def run(measurement):
+            progress = fan_out(
+                "Benchmark announcement",
+                f"benchmark-{time.time_ns()}",
+                users=NewUser.objects.filter(is_active=True),
+                batch_size=self.batch_size,
+                using=self.using,
+            )
+            measurement.operations = progress["inserted"]
+
+        return self.measure_scenario("notification_fanout", run)
+
+    def admin_changelist(self):
+        """
+        Render the first page of the user changelist in the admin.
+        """
+        superuser = NewUser.objects.db_manager(self.using).create_superuser(
+            email=f"benchmark-{time.time_ns()}@example.com",
+            username=f"benchmark-{time.time_ns()}",
+            full_name="Benchmark Admin",
+            password=None,
+            date_of_birth=datetime.date(1990, 1, 1),
+            phone_number="+9779841234567",
+        )
+        model_admin = admin.site._registry[NewUser]
+        request = RequestFactory().get(f"/admin/account/{NewUser._meta.model_name}/")
+        request.user = superuser
+
+        def run(measurement):
+            response = model_admin.changelist_view(request)
+            response.render()
+            measurement.operations = 1
+
+        return self.measure_scenario("admin_changelist", run)
+
+
+def current_commit():
+    """
+    Return the git commit of the working tree, if available.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(results, directory, using="default"):
+    """
+    Write the measurements of a benchmark run to a timestamped JSON file.
+
+    Args:
+        results (list): Measurements of every scenario and scale.
+        directory (str): Directory the file is written to.
+        using (str, optional): The database alias the benchmark ran against.
+
+    Returns:
+        str: Path of the written file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    created_at = timezone.now()
+    path = os.path.join(directory, f"benchmark-{created_at:%Y%m%dT%H%M%S}.json")
+    report = {
+        "created_at": created_at.isoformat(),
+        "commit": current_commit(),
+        "vendor": connections[using].vendor,
+        "results": [measurement.as_dict() for measurement in results],
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+    return path
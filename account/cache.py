@@ -0,0 +1,232 @@
+"""
+This module contains the two tier cache for user lookups.
+
+A lookup first checks a small in-process LRU, then the shared Django cache
+and only then the database. Users are cached together with their profile.
+Writes invalidate both tiers of the current process and the shared cache,
+the in-process tier of other processes expires after USER_CACHE_LOCAL_TTL.
+
+Inside a transaction, users read from the database are only cached once it
+commits, and invalidations are repeated after the commit, so neither
+uncommitted rows nor rows re-cached by a concurrent reader outlive it.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+
+class LocalLRUCache:
+    """
+    Thread safe least recently used cache whose entries expire after a TTL.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        """
+        Args:
+            maxsize (int, optional): Maximum number of entries.
+            ttl (float, optional): Seconds an entry stays valid.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the value of a key, or None if it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        """
+        Remove keys, missing keys are ignored.
+        """
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+class UserCache:
+    """
+    Cache users by username and email in an in-process LRU and the shared cache.
+
+    Attributes:
+        counters (dict): Number of local hits, shared hits and misses.
+    """
+
+    LOOKUP_FIELDS = ["username", "email"]
+
+    def __init__(self):
+        self._local = None
+        self.lock = threading.Lock()
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    @property
+    def local(self):
+        """
+        The in-process tier, created from the settings on first use.
+        """
+        if self._local is None:
+            self._local = LocalLRUCache(
+                getattr(settings, "USER_CACHE_LOCAL_SIZE", 1024),
+                getattr(settings, "USER_CACHE_LOCAL_TTL", 30),
+            )
+        return self._local
+
+    def key(self, model, field, value):
+        """
+        Return the cache key of a lookup.
+        """
+        return f"account:user:{model._meta.label_lower}:{field}:{value}"
+
+    def index_key(self, model, pk):
+        """
+        Return the cache key listing the lookup keys cached for a user.
+        """
+        return f"account:user:{model._meta.label_lower}:keys:{pk}"
+
+    def count(self, counter):
+        """
+        Increment a hit or miss counter.
+        """
+        with self.lock:
+            self.counters[counter] += 1
+
+    def get(self, queryset, field, value):
+        """
+        Return the user whose field equals value.
+
+        Args:
+            queryset (QuerySet): The user queryset used on a miss.
+            field (str): One of LOOKUP_FIELDS.
+            value (str): The username or email.
+
+        Returns:
+            Model: A copy of the cached user, safe to modify.
+
+        Raises:
+            DoesNotExist: If there is no such user. Misses are not cached.
+        """
+        model = queryset.model
+        key = self.key(model, field, value)
+        user = self.local.get(key)
+        if user is not None:
+            self.count("local_hits")
+            return copy.deepcopy(user)
+
+        user = cache.get(key)
+        if user is not None:
+            self.count("shared_hits")
+            self.local.set(key, user)
+            return copy.deepcopy(user)
+
+        self.count("misses")
+        # the profile is cached along with the user
+        if any(relation.name == "profile" for relation in model._meta.related_objects):
+            queryset = queryset.select_related("profile")
+        user = queryset.get(**{field: value})
+        keys = [self.key(model, name, getattr(user, name)) for name in self.LOOKUP_FIELDS]
+
+        def store():
+            timeout = getattr(settings, "USER_CACHE_TIMEOUT", 300)
+            cache.set_many({key: user for key in keys}, timeout)
+            cache.set(self.index_key(model, user.pk), keys, timeout)
+            self.local.set(key, user)
+
+        # the row may be uncommitted, it is cached once the transaction commits
+        transaction.on_commit(store, using=queryset.db)
+        return copy.deepcopy(user)
+
+    def invalidate(self, model, pks, using="default"):
+        """
+        Drop the cached lookups of users, now and again after the current transaction commits.
+
+        Signals invalidate single writes, callers of queryset.update() and
+        bulk_create must call this with the primary keys they changed.
+
+        Args:
+            model (Model): The user model.
+            pks (iterable): Primary keys of the changed users.
+            using (str, optional): The database alias the users were written to.
+        """
+        pks = set(pks)
+        self.drop(model, pks)
+        if connections[using].in_atomic_block:
+            # a concurrent reader may cache the old row until the write commits
+            transaction.on_commit(lambda: self.drop(model, pks), using=using)
+
+    def drop(self, model, pks):
+        """
+        Remove the cached lookups of users from both tiers.
+
+        Args:
+            model (Model): The user model.
+            pks (set): Primary keys of the users.
+        """
+        index_keys = [self.index_key(model, pk) for pk in pks]
+        keys = set(index_keys)
+        for cached_keys in cache.get_many(index_keys).values():
+            keys.update(cached_keys)
+        cache.delete_many(list(keys))
+        # entries of other processes expire with the local TTL
+        self.local.delete_many(keys)
+        with self.local.lock:
+            prefix = f"account:user:{model._meta.label_lower}:"
+            stale = [
+                key for key, (_, user) in self.local.entries.items()
+                if key.startswith(prefix) and user.pk in pks
+            ]
+        self.local.delete_many(stale)
+
+    def stats(self):
+        """
+        Return the hit and miss counters with the hit ratio.
+        """
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = sum(stats.values())
+        stats["hit_ratio"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else None
+        return stats
+
+    def reset_stats(self):
+        """
+        Set the hit and miss counters back to zero.
+        """
+        with self.lock:
+            for counter in self.counters:
+                self.counters[counter] = 0
+
+
+# cache shared by every user manager of the process
+user_cache = UserCache()
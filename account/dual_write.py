@@ -0,0 +1,257 @@
+"""
+This module mirrors writes on the legacy user table into the new user table.
+
+While the new user table is being backfilled, every write to the legacy table
+is mirrored either by PostgreSQL triggers (installed with the user_dual_write
+command) or, with the USER_DUAL_WRITE setting, by the signal handlers in
+account.signals. A final cut-over copies the remaining delta and removes the triggers.
+"""
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from account.backfill import USER_COPY_FIELDS, log_skipped
+from account.cache import user_cache
+from account.models import User, NewUser, Profile
+
+# name shared by the trigger and its trigger function
+TRIGGER_NAME = "account_user_dual_write"
+
+
+def mirror_legacy_users(pks, using="default"):
+    """
+    Insert or update the new users matching a set of legacy users.
+
+    This is the bulk-aware sync hook: callers that write legacy users with
+    bulk_create or queryset.update() pass the affected primary keys here.
+
+    The legacy email is not unique, so a legacy user whose email belongs to
+    another new user is skipped and logged like in copy_users.
+
+    Args:
+        pks (iterable): Primary keys of legacy users.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: Number of legacy users mirrored.
+    """
+    rows = list(User.objects.using(using).filter(pk__in=list(pks)).order_by("pk").values(*USER_COPY_FIELDS))
+    if not rows:
+        return 0
+    new_users = NewUser.objects.using(using)
+    existing = dict(new_users.filter(username__in=[row["username"] for row in rows]).values_list("username", "pk"))
+    email_owners = dict(new_users.filter(email__in=[row["email"] for row in rows]).values_list("email", "username"))
+
+    inserts, updates, skipped = [], [], []
+    now = timezone.now()
+    for row in rows:
+        owner = email_owners.setdefault(row["email"], row["username"])
+        if owner != row["username"]:
+            skipped.append(row["username"])
+        elif row["username"] in existing:
+            # bulk_update does not run auto_now
+            updates.append(NewUser(pk=existing[row["username"]], updated_at=now, **row))
+        else:
+            inserts.append(NewUser(**row))
+    # a conflicting concurrent write skips the row instead of failing the legacy write
+    new_users.bulk_create(inserts, ignore_conflicts=True)
+    new_users.bulk_update(
+        updates, [field for field in USER_COPY_FIELDS if field != "username"] + ["updated_at"]
+    )
+    log_skipped(skipped)
+
+    mirrored_usernames = [row["username"] for row in rows if row["username"] not in skipped]
+    if not mirrored_usernames:
+        return 0
+    mirrored = new_users.filter(username__in=mirrored_usernames)
+    Profile.objects.db_manager(using).provision(mirrored)
+    # bulk writes do not send post_save, so the cached users are dropped here
+    user_cache.invalidate(NewUser, mirrored.values_list("pk", flat=True), using)
+    return len(mirrored_usernames)
+
+
+def rename_mirrored_user(old_username, new_username, using="default"):
+    """
+    Follow a username change of a legacy user in the new user table.
+
+    A new username that is already taken is skipped and logged.
+
+    Args:
+        old_username (str): The username before the change.
+        new_username (str): The username after the change.
+        using (str, optional): The database alias.
+    """
+    new_users = NewUser.objects.using(using)
+    if new_users.filter(username=new_username).exists():
+        log_skipped([new_username])
+        return
+    renamed = new_users.filter(username=old_username)
+    user_cache.invalidate(NewUser, renamed.values_list("pk", flat=True), using)
+    # queryset.update() does not run auto_now
+    renamed.update(username=new_username, updated_at=timezone.now())
+
+
+def remove_mirrored_users(usernames, using="default"):
+    """
+    Delete the new users matching deleted legacy users.
+
+    Args:
+        usernames (iterable): Usernames of the deleted legacy users.
+        using (str, optional): The database alias.
+    """
+    NewUser.objects.using(using).filter(username__in=list(usernames)).delete()
+
+
+def cascade_delete_sql(model, condition, quote):
+    """
+    Return the statements deleting the rows of a model and every row that references them.
+
+    The database foreign keys do not cascade, Django does that in Python, so
+    the trigger has to delete the referencing rows itself. Rows referenced
+    with SET_NULL are detached instead.
+
+    Args:
+        model (Model): The model whose rows are deleted.
+        condition (str): SQL condition selecting the rows.
+        quote (callable): Quotes a table or column name.
+
+    Returns:
+        list: The statements, referencing rows first.
+    """
+    table = quote(model._meta.db_table)
+    rows = f"SELECT {quote(model._meta.pk.column)} FROM {table} WHERE {condition}"
+    statements = []
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        column = through._meta.get_field(field.m2m_field_name()).column
+        statements.append(f"DELETE FROM {quote(through._meta.db_table)} WHERE {quote(column)} IN ({rows})")
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            through = relation.through
+            column = through._meta.get_field(relation.field.m2m_reverse_field_name()).column
+            statements.append(f"DELETE FROM {quote(through._meta.db_table)} WHERE {quote(column)} IN ({rows})")
+            continue
+        related_table = quote(relation.related_model._meta.db_table)
+        column = quote(relation.field.column)
+        if relation.on_delete is models.CASCADE:
+            statements += cascade_delete_sql(relation.related_model, f"{column} IN ({rows})", quote)
+        elif relation.on_delete is models.SET_NULL:
+            statements.append(f"UPDATE {related_table} SET {column} = NULL WHERE {column} IN ({rows})")
+    statements.append(f"DELETE FROM {table} WHERE {condition}")
+    return statements
+
+
+def install_triggers(using="default"):
+    """
+    Install the PostgreSQL trigger that mirrors every write on the legacy user table.
+
+    The trigger also sees writes made with raw SQL, bulk_create and
+    queryset.update(), which the signal handlers cannot.
+
+    Args:
+        using (str, optional): The database alias.
+    """
+    connection = connections[using]
+    old_table = User._meta.db_table
+    new_table = NewUser._meta.db_table
+    profile_table = Profile._meta.db_table
+    columns = ", ".join(USER_COPY_FIELDS)
+    values = ", ".join(f"NEW.{field}" for field in USER_COPY_FIELDS)
+    updates = ", ".join(
+        f"{field} = NEW.{field}" for field in USER_COPY_FIELDS if field != "username"
+    )
+    deletes = "\n".join(
+        f"{sql};" for sql in cascade_delete_sql(NewUser, "username = OLD.username", connection.ops.quote_name)
+    )
+    # a mirroring conflict is only logged, it must never fail the legacy write,
+    # the exception block rolls back the mirrored changes of the failed row only
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {TRIGGER_NAME}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    {deletes}
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'UPDATE' AND NEW.username <> OLD.username THEN
+                    UPDATE {new_table} SET username = NEW.username WHERE username = OLD.username
+                    AND NOT EXISTS (SELECT 1 FROM {new_table} WHERE username = NEW.username);
+                END IF;
+                UPDATE {new_table} SET {updates}, updated_at = now()
+                WHERE username = NEW.username
+                AND NOT EXISTS (
+                    SELECT 1 FROM {new_table} WHERE email = NEW.email AND username <> NEW.username
+                );
+                IF NOT FOUND THEN
+                    INSERT INTO {new_table} ({columns}, joined_at, updated_at)
+                    VALUES ({values}, now(), now())
+                    ON CONFLICT DO NOTHING;
+                END IF;
+                IF NOT EXISTS (
+                    SELECT 1 FROM {new_table} WHERE username = NEW.username AND email = NEW.email
+                ) THEN
+                    RAISE WARNING 'legacy user % was not mirrored, its username or email already exists',
+                        NEW.username;
+                END IF;
+                INSERT INTO {profile_table} (user_id, updated_at)
+                SELECT id, now() FROM {new_table} WHERE username = NEW.username
+                ON CONFLICT (user_id) DO NOTHING;
+                RETURN NULL;
+            EXCEPTION WHEN OTHERS THEN
+                RAISE WARNING 'could not mirror legacy user %: %', COALESCE(NEW.username, OLD.username), SQLERRM;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON {old_table}")
+        cursor.execute(
+            f"CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE ON {old_table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {TRIGGER_NAME}()"
+        )
+
+
+def remove_triggers(using="default"):
+    """
+    Remove the dual-write trigger and its function.
+
+    Args:
+        using (str, optional): The database alias.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON {User._meta.db_table}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {TRIGGER_NAME}()")
+
+
+def cutover(batch_size=1000, using="default"):
+    """
+    Copy the legacy users that are still missing from the new user table.
+
+    Legacy users whose email is already taken are skipped and logged.
+
+    On PostgreSQL the legacy table is locked against writes while the delta
+    is copied and the dual-write trigger is removed afterwards, so no write
+    can slip in between.
+
+    Args:
+        batch_size (int, optional): Number of users mirrored per statement.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: Number of legacy users copied.
+    """
+    is_postgresql = connections[using].vendor == "postgresql"
+    with transaction.atomic(using=using):
+        if is_postgresql:
+            with connections[using].cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {User._meta.db_table} IN SHARE MODE")
+        pending = list(
+            User.objects.using(using)
+            .exclude(username__in=NewUser.objects.using(using).values("username"))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        copied = 0
+        for index in range(0, len(pending), batch_size):
+            copied += mirror_legacy_users(pending[index:index + batch_size], using)
+        if is_postgresql:
+            remove_triggers(using)
+    return copied
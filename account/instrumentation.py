@@ -0,0 +1,199 @@
+"""
+This module contains progress instrumentation for long running data migrations.
+
+InstrumentedRunPython works like RunPython but passes a MigrationProgress to
+the migration function. The function reports every batch to it and the
+progress logs timing, throughput, estimated time remaining and query count.
+If MIGRATION_METRICS_DIR is set, a JSON summary of the run is written there.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, migrations, router
+from django.utils import timezone
+
+logger = logging.getLogger("account.migrations")
+
+
+class MigrationProgress:
+    """
+    Collect per batch metrics of a data migration.
+
+    Attributes:
+        name (str): Name of the migration step.
+        total (int): Expected number of rows, if known.
+        rows (int): Number of rows processed so far.
+        queries (int): Number of queries executed so far.
+        batches (list): Metrics of every finished batch.
+    """
+
+    def __init__(self, name, total=None, using="default"):
+        self.name = name
+        self.total = total
+        self.using = using
+        self.rows = 0
+        self.queries = 0
+        self.batches = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def _count_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper that counts queries.
+        """
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def track_queries(self):
+        """
+        Count the queries executed on the migration's connection inside the block.
+        """
+        with connections[self.using].execute_wrapper(self._count_query):
+            yield self
+
+    def start(self, total):
+        """
+        Set the expected number of rows, used for the time remaining estimate.
+
+        Args:
+            total (int): Expected number of rows.
+        """
+        self.total = total
+        logger.info("%s: %s rows to process", self.name, total)
+
+    @contextmanager
+    def batch(self, rows):
+        """
+        Measure one batch.
+
+        Args:
+            rows (int): Number of rows in the batch.
+        """
+        started = time.perf_counter()
+        queries = self.queries
+        yield
+        seconds = time.perf_counter() - started
+        self.rows += rows
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        eta = (self.total - self.rows) / rate if self.total and rate else None
+        metrics = {
+            "rows": rows,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(rows / seconds, 2) if seconds else None,
+            "queries": self.queries - queries,
+        }
+        self.batches.append(metrics)
+        logger.info(
+            "%s: batch %s, %s rows in %.3fs (%.0f rows/s), %s/%s rows, ETA %s, %s queries",
+            self.name,
+            len(self.batches),
+            rows,
+            seconds,
+            metrics["rows_per_second"] or 0,
+            self.rows,
+            self.total if self.total is not None else "?",
+            f"{eta:.1f}s" if eta is not None else "unknown",
+            metrics["queries"],
+        )
+
+    def finish(self):
+        """
+        Mark the run as finished and log the summary.
+
+        Returns:
+            dict: The summary of the run.
+        """
+        self.finished = time.perf_counter()
+        summary = self.summary()
+        logger.info(
+            "%s: finished %s rows in %.2fs (%.0f rows/s), %s queries",
+            self.name,
+            summary["rows"],
+            summary["seconds"],
+            summary["rows_per_second"] or 0,
+            summary["queries"],
+        )
+        return summary
+
+    def summary(self):
+        """
+        Return the metrics of the run as a JSON serializable dict.
+        """
+        seconds = (self.finished or time.perf_counter()) - self.started
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "total": self.total,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(self.rows / seconds, 2) if seconds else None,
+            "queries": self.queries,
+            "batches": self.batches,
+        }
+
+    def write_summary(self, directory):
+        """
+        Write the summary of the run to a timestamped JSON file.
+
+        Args:
+            directory (str): Directory the file is written to.
+
+        Returns:
+            str: Path of the written file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        filename = f"{self.name}-{timezone.now():%Y%m%dT%H%M%S}.json"
+        path = os.path.join(directory, filename)
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+        return path
+
+
+class InstrumentedRunPython(migrations.RunPython):
+    """
+    RunPython operation that passes a MigrationProgress to the migration function.
+
+    The forward function is called as code(apps, schema_editor, progress).
+
+    Usage:
+        migrations.RunPython is replaced with
+        InstrumentedRunPython(copy_users, name="account.0003.copy_users")
+    """
+
+    def __init__(self, code, reverse_code=None, name=None, **kwargs):
+        self.progress_name = name or code.__name__
+        # code stays the migration function so deconstruct() serializes it
+        super().__init__(code, reverse_code=reverse_code, **kwargs)
+
+    def deconstruct(self):
+        """
+        Return the constructor arguments, including the progress name.
+        """
+        name, args, kwargs = super().deconstruct()
+        kwargs["name"] = self.progress_name
+        return name, args, kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        """
+        Run the migration function instrumented, like RunPython does uninstrumented.
+        """
+        from_state.clear_delayed_apps_cache()
+        if router.allow_migrate(schema_editor.connection.alias, app_label, **self.hints):
+            self.run_instrumented(from_state.apps, schema_editor)
+
+    def run_instrumented(self, apps, schema_editor):
+        """
+        Run the migration function with query counting and a progress summary.
+        """
+        progress = MigrationProgress(self.progress_name, using=schema_editor.connection.alias)
+        with progress.track_queries():
+            self.code(apps, schema_editor, progress)
+        progress.finish()
+        metrics_dir = getattr(settings, "MIGRATION_METRICS_DIR", None)
+        if metrics_dir:
+            progress.write_summary(metrics_dir)
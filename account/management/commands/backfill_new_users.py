@@ -0,0 +1,153 @@
+"""
+    This module is management command for backfilling new users from the legacy user table in parallel
+"""
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from account.backfill import copy_users, ensure_checkpoint_table
+from account.models import User, NewUser, Profile
+
+
+def split_pk_ranges(min_pk, max_pk, range_size):
+    """
+    Split a primary key interval into contiguous ranges of a fixed size.
+
+    The range bounds are multiples of range_size, so they do not depend on
+    the number of workers or on the current largest primary key, and a rerun
+    finds the checkpoints of the ranges it already copied.
+
+    Args:
+        min_pk (int): The smallest primary key.
+        max_pk (int): The largest primary key.
+        range_size (int): Number of primary keys per range.
+
+    Returns:
+        list: (start_pk, end_pk) tuples where start_pk is exclusive and end_pk inclusive.
+    """
+    first = (min_pk - 1) // range_size
+    last = (max_pk - 1) // range_size
+    return [(index * range_size, (index + 1) * range_size) for index in range(first, last + 1)]
+
+
+def copy_pk_range(start_pk, end_pk, batch_size):
+    """
+    Copy one primary key range of legacy users. Runs inside a worker process.
+
+    Args:
+        start_pk (int): Exclusive lower bound of the range.
+        end_pk (int): Inclusive upper bound of the range.
+        batch_size (int): Number of rows per batch.
+
+    Returns:
+        tuple: (worker pid, rows copied, seconds spent)
+    """
+    started = time.perf_counter()
+    rows = copy_users(
+        User,
+        NewUser,
+        Profile,
+        step=f"backfill_new_users:{start_pk}-{end_pk}",
+        batch_size=batch_size,
+        start_pk=start_pk,
+        end_pk=end_pk,
+        create_checkpoint_table=False,
+    )
+    return os.getpid(), rows, time.perf_counter() - started
+
+
+def init_worker():
+    """
+    Set up django in a worker process. Each worker opens its own database connection.
+    """
+    django.setup()
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to copy legacy users into the new user table in parallel
+
+    Usuage:
+        python manage.py backfill_new_users [--workers N] [--batch-size N] [--range-size N]
+
+    Example:
+        To copy users with 8 worker processes, run:
+            python manage.py backfill_new_users --workers 8
+    """
+    help = "Copy legacy users into the new user table using a pool of worker processes"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+        parser.add_argument("--batch-size", type=int, default=None, help="number of rows copied per batch")
+        parser.add_argument(
+            "--range-size",
+            type=int,
+            default=50000,
+            help="number of primary keys per range handed to a worker, keep it fixed between reruns",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        workers = max(1, kwargs["workers"])
+        batch_size = kwargs["batch_size"]
+        if workers > 1 and connection.vendor == "sqlite":
+            # sqlite allows a single writer, parallel workers would only fight over the lock
+            self.stdout.write(self.style.WARNING("SQLite does not support parallel writers, using 1 worker"))
+            workers = 1
+
+        bounds = User.objects.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+        if bounds["min_pk"] is None:
+            self.stdout.write(self.style.SUCCESS("No legacy users to copy"))
+            return
+        ranges = split_pk_ranges(bounds["min_pk"], bounds["max_pk"], max(1, kwargs["range_size"]))
+        # created once here, concurrent CREATE TABLE IF NOT EXISTS can fail on PostgreSQL
+        ensure_checkpoint_table()
+
+        started = time.perf_counter()
+        results = []
+        if workers == 1:
+            for start_pk, end_pk in ranges:
+                results.append(copy_pk_range(start_pk, end_pk, batch_size))
+        else:
+            # workers must not share the parent's connection, so close it before forking
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = [
+                    executor.submit(copy_pk_range, start_pk, end_pk, batch_size)
+                    for start_pk, end_pk in ranges
+                ]
+                for future in as_completed(futures):
+                    results.append(future.result())
+        elapsed = time.perf_counter() - started
+
+        # merge the per range results into per worker totals
+        per_worker = defaultdict(lambda: [0, 0.0])
+        for pid, rows, seconds in results:
+            per_worker[pid][0] += rows
+            per_worker[pid][1] += seconds
+        for pid, (rows, seconds) in sorted(per_worker.items()):
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f"worker {pid}: {rows} rows in {seconds:.2f}s ({rate:.0f} rows/s)")
+
+        total = sum(rows for _, rows, _ in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully copied {total} users in {elapsed:.2f}s using {workers} workers"
+        ))
@@ -2,54 +2,106 @@
 This is management command for backing up user table data in postgresql
 """
 import os
+import shutil
 import subprocess
-from django.core.management.base import BaseCommand
+import time
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 
+from account.backups import DUMP_FORMATS, build_pg_dump_command, path_size, prune_backups, timestamped_dir
+
 
 class Command(BaseCommand):
     """
     Custom Management Command to backup user data from Postgresql.
 
+    The directory format dumps tables in parallel with --jobs and compresses
+    every table file. With --timestamped every run writes to its own
+    directory and --keep deletes the oldest runs. pg_dump refuses to write a
+    directory dump into an existing directory, so the directory format
+    requires --timestamped.
+
     Usuage:
-        python manage.py backup_sql_postgres
-    
+        python manage.py backup_sql_postgres [--format plain|custom|directory] [--jobs N]
+            [--compress 0-9] [--timestamped] [--keep N]
+
     Example:
-        To create 1000 fake users, run:
+        To create a plain SQL backup, run:
             python manage.py backup_sql_postgres
         Then it will ask for password.
+        To dump with 4 parallel jobs and keep the last 7 backups, run:
+            python manage.py backup_sql_postgres --format directory --jobs 4 --compress 6 --timestamped --keep 7
     """
     help = "Backup user data from postgres sql datbase"
 
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--format", choices=list(DUMP_FORMATS), default="plain", help="pg_dump output format")
+        parser.add_argument("--jobs", type=int, default=1, help="number of tables dumped in parallel, directory format only")
+        parser.add_argument("--compress", type=int, choices=range(10), default=None, help="compression level from 0 to 9")
+        parser.add_argument("--output-dir", default="data_backups", help="directory holding the backups")
+        parser.add_argument("--timestamped", action="store_true", help="write every backup to its own timestamped directory")
+        parser.add_argument("--keep", type=int, default=None, help="number of timestamped backups to keep")
+
     def handle(self, *args, **options):
         """
         This method handles the command execution login
         """
-        db_name = settings.DATABASES['default']['NAME']
-        db_username = settings.DATABASES['default']['USER']
-        db_host = settings.DATABASES['default']['HOST']
-        db_port = settings.DATABASES['default']['PORT']
+        if options["jobs"] > 1 and options["format"] != "directory":
+            raise CommandError("--jobs requires --format directory")
+        if options["keep"] is not None and not options["timestamped"]:
+            raise CommandError("--keep requires --timestamped")
+        if options["format"] == "directory" and not options["timestamped"]:
+            raise CommandError("--format directory requires --timestamped")
 
         # specify the backup dirs and filename
-        backup_dir = "data_backups"
-        backup_file = os.path.join(backup_dir, 'backup_sql_postgres.sql')
+        backup_dir = options["output_dir"]
+        if options["timestamped"]:
+            backup_dir = timestamped_dir(options["output_dir"])
+        backup_file = os.path.join(backup_dir, DUMP_FORMATS[options["format"]])
+        if options["format"] == "plain" and options["compress"]:
+            # pg_dump gzips plain dumps when a compression level is given
+            backup_file += ".gz"
 
         # create backup_dir if only exists - false
         os.makedirs(backup_dir, exist_ok=True)
 
         # Construct pg_dump command
-        pg_dump_command = [
-            'pg_dump',
-            '-U', db_username,
-            '-d', db_name,
-            '--host', db_host,
-            '--port', db_port,
-            '-f', backup_file,
-        ]
+        database = settings.DATABASES['default']
+        pg_dump_command = build_pg_dump_command(
+            database,
+            backup_file,
+            dump_format=options["format"],
+            jobs=options["jobs"],
+            compress=options["compress"],
+        )
+        env = dict(os.environ)
+        if database.get('PASSWORD'):
+            env['PGPASSWORD'] = database['PASSWORD']
 
+        started = time.perf_counter()
         try:
             # execute the pg_dump command
-            subprocess.run(pg_dump_command, check=True)
-            self.stdout.write(self.style.SUCCESS(f"Backup file {backup_file} created successfully"))
+            subprocess.run(pg_dump_command, check=True, env=env)
         except subprocess.CalledProcessError as e:
-            self.stdout.write(self.style.ERROR(f'Error in creating backup: {e}'))
+            # remove the partial backup so pruning does not count it as a backup
+            partial = backup_dir if options["timestamped"] else backup_file
+            if os.path.isdir(partial):
+                shutil.rmtree(partial)
+            elif os.path.exists(partial):
+                os.remove(partial)
+            raise CommandError(f'Error in creating backup: {e}')
+        elapsed = time.perf_counter() - started
+        size = path_size(backup_file)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backup {backup_file} created successfully in {elapsed:.2f}s ({size / 2 ** 20:.1f} MiB)"
+        ))
+
+        if options["keep"] is not None:
+            for path in prune_backups(options["output_dir"], options["keep"]):
+                self.stdout.write(f"Removed expired backup {path}")
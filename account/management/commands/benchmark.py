@@ -0,0 +1,71 @@
+"""
+    This module is management command for benchmarking the account, address and notification apps
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.benchmarks import DEFAULT_SCALES, BenchmarkSuite, write_report
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to measure the main scenarios of the project
+    at several dataset sizes
+
+    Every scale runs in its own transaction that is rolled back at the end,
+    so the database is left unchanged. The timings, query counts and peak
+    memory of every scenario are written to a JSON report.
+
+    Usuage:
+        python manage.py benchmark [--scales N ...] [--scenarios NAME ...] [--output-dir DIR]
+
+    Example:
+        To benchmark every scenario at 10k and 100k users, run:
+            python manage.py benchmark --scales 10000 100000
+    """
+    help = "Benchmark seeding, the user copy, lookups, birthdays, notification fan-out and the admin"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="numbers of users to benchmark with")
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            choices=BenchmarkSuite.SCENARIOS[1:],
+            default=BenchmarkSuite.SCENARIOS[1:],
+            help="scenarios to run after seeding",
+        )
+        parser.add_argument("--lookups", type=int, default=1000, help="number of single user lookups")
+        parser.add_argument("--batch-size", type=int, default=10000, help="number of rows loaded per batch")
+        parser.add_argument("--seed", type=int, default=42, help="seed for reproducible data")
+        parser.add_argument("--output-dir", default="benchmarks", help="directory of the JSON report")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        results = []
+        for scale in kwargs["scales"]:
+            suite = BenchmarkSuite(scale, lookups=kwargs["lookups"], batch_size=kwargs["batch_size"], seed=kwargs["seed"])
+            with transaction.atomic():
+                # the other scenarios work on the seeded users
+                measurements = suite.run(["seed"] + kwargs["scenarios"])
+                transaction.set_rollback(True)
+            for measurement in measurements:
+                self.stdout.write(
+                    f"{scale} users, {measurement.scenario}: {measurement.seconds:.3f}s, "
+                    f"{measurement.queries} queries, {measurement.peak_memory / 2 ** 20:.1f} MiB peak"
+                )
+            results.extend(measurements)
+
+        path = write_report(results, kwargs["output_dir"])
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {path}"))
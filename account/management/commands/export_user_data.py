@@ -0,0 +1,65 @@
+"""
+    This module is management command for incremental exports of user data
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from account.exports import export_user_data, restore_user_data
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to export the users and profiles changed since
+    the last export, or to restore a chain of exports
+
+    The first export, and every export with --full, writes all rows. The
+    following exports only write the rows whose updated_at is newer than the
+    high-water mark of the previous export.
+
+    Usuage:
+        python manage.py export_user_data [--full] [--output-dir DIR] [--chunk-size N]
+        python manage.py export_user_data --restore [--output-dir DIR]
+
+    Example:
+        To take a nightly incremental export, run:
+            python manage.py export_user_data
+        To restore the latest full export and all of its increments, run:
+            python manage.py export_user_data --restore
+    """
+    help = "Export users and profiles changed since the last export, or restore the exports"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--output-dir", default="data_backups/exports", help="directory holding the exports")
+        parser.add_argument("--full", action="store_true", help="export every row and start a new chain")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="maximum number of rows per chunk file")
+        parser.add_argument("--restore", action="store_true", help="replay the latest full export and its increments")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        if kwargs["restore"]:
+            try:
+                restored = restore_user_data(kwargs["output_dir"], batch_size=min(kwargs["chunk_size"], 1000))
+            except ValueError as e:
+                raise CommandError(str(e))
+            for directory, rows in restored:
+                self.stdout.write(f"Restored {rows} rows from {directory}")
+            self.stdout.write(self.style.SUCCESS(f"Successfully restored {len(restored)} exports"))
+            return
+
+        directory, manifest = export_user_data(kwargs["output_dir"], full=kwargs["full"], chunk_size=kwargs["chunk_size"])
+        for table, info in manifest["tables"].items():
+            self.stdout.write(f"{table}: {info['rows']} rows in {len(info['chunks'])} chunks")
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully wrote {manifest['kind']} export {directory} up to {manifest['until']}"
+        ))
@@ -0,0 +1,121 @@
+"""
+    This module is management command for generating a full fake dataset for every app
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django.contrib.auth import get_user_model
+
+from account.loaders import copy_rows
+from account.models import Activity
+from account.seeding import (
+    DATASET_PROFILES,
+    PasswordFactory,
+    RelatedDataGenerator,
+    UserDataGenerator,
+    load_users,
+    next_sequence_start,
+)
+from address.models import Address
+from notification.manager import refresh_unread_counts
+from notification.models import Notification
+
+User = get_user_model()
+
+
+def parse_range(value):
+    """
+    Parse a per user count like "3" or "0-5" into (low, high).
+
+    Args:
+        value (str): The command-line value.
+
+    Returns:
+        tuple: The inclusive bounds.
+    """
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to generate users with profiles, addresses,
+    notifications and activities at a configurable scale
+
+    Every table is streamed to the database in batches of users with the
+    copy loader, so memory use does not grow with the number of users.
+
+    Usuage:
+        python manage.py generate_dataset --users N [--profile minimal|realistic] [--seed N]
+
+    Example:
+        To generate a reproducible benchmark fixture with one million users, run:
+            python manage.py generate_dataset --users 1000000 --profile realistic --seed 42
+    """
+    help = "Generate a fake dataset for every app with configurable per user distributions"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--users", type=int, required=True, help="number of users to generate")
+        parser.add_argument("--profile", choices=sorted(DATASET_PROFILES), default="realistic", help="per user distributions")
+        parser.add_argument("--batch-size", type=int, default=10000, help="number of users loaded per batch")
+        parser.add_argument("--seed", type=int, default=None, help="seed for reproducible data")
+        parser.add_argument("--addresses", type=parse_range, default=None, help="addresses per user, e.g. 0-3")
+        parser.add_argument("--notifications", type=parse_range, default=None, help="notifications per user, e.g. 0-25")
+        parser.add_argument("--activities", type=parse_range, default=None, help="activities per user, e.g. 0-40")
+        parser.add_argument("--read-ratio", type=float, default=None, help="share of notifications marked read")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        total = kwargs["users"]
+        batch_size = kwargs["batch_size"]
+        distribution = dict(DATASET_PROFILES[kwargs["profile"]])
+        for key in ["addresses", "notifications", "activities", "read_ratio"]:
+            if kwargs[key] is not None:
+                distribution[key] = kwargs[key]
+
+        users = UserDataGenerator(seed=kwargs["seed"], start=next_sequence_start(User))
+        related = RelatedDataGenerator(distribution, seed=kwargs["seed"])
+        passwords = PasswordFactory(mode="once")
+        counts = {"users": 0, "addresses": 0, "notifications": 0, "activities": 0}
+        started = time.perf_counter()
+
+        for rows in users.batches(total, batch_size):
+            with transaction.atomic():
+                user_ids = load_users(rows, passwords.hashes(len(rows)), chunk_size=batch_size)
+                counts["users"] += len(user_ids)
+                counts["addresses"] += copy_rows(
+                    Address, related.ADDRESS_FIELDS, related.addresses(user_ids), chunk_size=batch_size
+                )
+                counts["notifications"] += copy_rows(
+                    Notification, related.NOTIFICATION_FIELDS, related.notifications(user_ids), chunk_size=batch_size
+                )
+                # the copy loader bypasses the unread counters
+                refresh_unread_counts(user_ids)
+                counts["activities"] += copy_rows(
+                    Activity, related.ACTIVITY_FIELDS, related.activities(user_ids), chunk_size=batch_size
+                )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Loaded {counts['users']}/{total} users in {elapsed:.1f}s")
+
+        elapsed = time.perf_counter() - started
+        # every user also has a profile row
+        rows_loaded = sum(counts.values()) + counts["users"]
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully generated {rows_loaded} rows in {elapsed:.2f}s ({rows_loaded / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
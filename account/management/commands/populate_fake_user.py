@@ -1,27 +1,85 @@
 """
     This module is management commands for populating fake user data
 """
-from faker import Faker
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 
-from django.core.management.base import BaseCommand
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 
 from django.contrib.auth import get_user_model
 
+from account.seeding import (
+    HASHING_MODES,
+    PasswordFactory,
+    UserDataGenerator,
+    hashing_report,
+    next_sequence_start,
+)
+
 User = get_user_model()
 
+
+def populate_users(total, start, namespace="", seed=None, password_hashing="once", hash_workers=None, log=None):
+    """
+    Create fake users one by one. Runs in the command process or in a worker process.
+
+    Args:
+        total (int): Number of users to create.
+        start (int): Sequence number of the first user.
+        namespace (str, optional): Username namespace, disjoint between workers.
+        seed (int, optional): Seed for reproducible fake data.
+        password_hashing (str, optional): Password hashing mode.
+        hash_workers (int, optional): Size of the password hashing pool.
+        log (callable, optional): Called with every created username.
+
+    Returns:
+        tuple: (users created, seconds spent, seconds spent hashing)
+    """
+    generator = UserDataGenerator(seed=seed, start=start, namespace=namespace)
+    passwords = PasswordFactory(mode=password_hashing, workers=hash_workers)
+    started = time.perf_counter()
+
+    # hash all passwords up front so pool mode can hash them in parallel
+    try:
+        fake_passwords = passwords.hashes(total)
+    finally:
+        passwords.close()
+
+    rows = chain.from_iterable(generator.batches(total, 1000))
+    for row, fake_password in zip(rows, fake_passwords):
+        # build the user with its hashed password so it is written once
+        user = User(password=fake_password, **row)
+        user.save()
+        if log:
+            log(user.username)
+    return total, time.perf_counter() - started, passwords.seconds
+
+
+def init_worker():
+    """
+    Set up django in a worker process. Each worker opens its own database connection.
+    """
+    django.setup()
+
+
 class Command(BaseCommand):
     """
     Custom management command to populate fake user data
 
     Usuage:
-        python manage.py populate_fake_user <total>
-    
+        python manage.py populate_fake_user <total> [--workers N]
+
     Args:
         total (int): total numbers of fake data
-    
+
     Example:
         To create 1000 fake users, run:
             python manage.py populate_fake_user 1000
+        To create them with 4 worker processes, run:
+            python manage.py populate_fake_user 1000 --workers 4
     """
     help = "Populate the database with fake user data"
 
@@ -33,7 +91,16 @@ class Command(BaseCommand):
             parser (ArgumentParser): The argument parser.
         """
         parser.add_argument("total", type=int, help="total: total number of fake user data")
-    
+        parser.add_argument(
+            "--password-hashing",
+            choices=HASHING_MODES,
+            default="once",
+            help="hash the password once for all users, per user, or per user in a process pool",
+        )
+        parser.add_argument("--hash-workers", type=int, default=None, help="size of the password hashing pool")
+        parser.add_argument("--seed", type=int, default=None, help="seed for reproducible fake data")
+        parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+
     def handle(self, *args, **kwargs):
         """
         Handle the execution logic of the management commmand
@@ -43,44 +110,62 @@ class Command(BaseCommand):
             kwargs: Additional keyword arguments
         """
         total = kwargs["total"]
-        fake = Faker()
-
-        unique_usernames = set()
-
-        for _ in range(total):
-            fake_email = fake.email()
-            fake_username = self.generate_unique_username(fake, unique_usernames)
-            fake_full_name = fake.name()
-            fake_date_of_birth = fake.date_of_birth(minimum_age=18, maximum_age=80)
-            fake_phone_number = fake.phone_number()
-            fake_password = "Password@123"
-            user = User.objects.create_user(
-                email=fake_email,
-                username=fake_username,
-                full_name=fake_full_name,
-                date_of_birth=fake_date_of_birth,
-                phone_number=fake_phone_number,
-            )
-            user.set_password(fake_password)
-            user.save()
-            self.stdout.write(self.style.SUCCESS(f'Successfully added user: {fake_username}'))
-        self.stdout.write(self.style.SUCCESS(f'Successfully populated the database with {total} fake users'))
+        workers = max(1, kwargs["workers"])
+        seed = kwargs["seed"]
+        start = next_sequence_start(User)
+        if workers > 1 and connection.vendor == "sqlite":
+            # sqlite allows a single writer, parallel workers would only fight over the lock
+            self.stdout.write(self.style.WARNING("SQLite does not support parallel writers, using 1 worker"))
+            workers = 1
 
-    
-    def generate_unique_username(self, fake, unique_usernames):
-        """
-        Generate a unique username.
+        if workers == 1:
+            created, seconds, hashing_seconds = populate_users(
+                total,
+                start,
+                seed=seed,
+                password_hashing=kwargs["password_hashing"],
+                hash_workers=kwargs["hash_workers"],
+                log=lambda username: self.stdout.write(self.style.SUCCESS(f'Successfully added user: {username}')),
+            )
+            self.stdout.write(hashing_report(kwargs["password_hashing"], hashing_seconds, seconds))
+            self.stdout.write(self.style.SUCCESS(f'Successfully populated the database with {total} fake users'))
+            return
 
-        Args:
-            fake (Faker): The Faker instance.
-            unique_usernames (set): A set of unique usernames.
+        if kwargs["password_hashing"] == "pool":
+            raise CommandError("--password-hashing pool cannot be combined with --workers, use per-user instead")
 
-        Returns:
-            str: A unique username.
-        """
+        # every worker gets an equal share and its own username namespace
+        shares = [total // workers + (1 if index < total % workers else 0) for index in range(workers)]
+        started = time.perf_counter()
+        # workers must not share the parent's connection, so close it before forking
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = [
+                executor.submit(
+                    populate_users,
+                    share,
+                    start,
+                    namespace=f"w{index}-",
+                    seed=seed + index if seed is not None else None,
+                    password_hashing=kwargs["password_hashing"],
+                )
+                for index, share in enumerate(shares)
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
 
-        while True:
-            fake_username = fake.user_name()
-            if fake_username not in unique_usernames:
-                unique_usernames.add(fake_username)
-                return fake_username
\ No newline at end of file
+        for index, (created, seconds, hashing_seconds) in enumerate(results):
+            rate = created / seconds if seconds else 0
+            self.stdout.write(
+                f"worker {index}: {created} users in {seconds:.2f}s ({rate:.0f} users/s), "
+                f"{hashing_seconds:.2f}s hashing"
+            )
+        created = sum(result[0] for result in results)
+        self.stdout.write(hashing_report(
+            kwargs["password_hashing"],
+            sum(result[2] for result in results),
+            sum(result[1] for result in results),
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully populated the database with {created} fake users in {elapsed:.2f}s using {workers} workers'
+        ))
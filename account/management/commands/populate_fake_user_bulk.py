@@ -1,11 +1,22 @@
 """
     This module is management commands for populating fake user data in bulk
 """
-from faker import Faker
+import time
 
 from django.core.management.base import BaseCommand
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from account.models import Profile
+from account.seeding import (
+    HASHING_MODES,
+    PasswordFactory,
+    UserDataGenerator,
+    hashing_report,
+    load_users,
+    next_sequence_start,
+)
 
 User = get_user_model()
 
@@ -13,15 +24,20 @@ class Command(BaseCommand):
     """
     Custom management command to populate fake user data
 
+    Users are generated a batch at a time and inserted with bulk_create, or
+    streamed with COPY on PostgreSQL when --loader copy is given, so memory
+    use does not grow with the total.
+
     Usuage:
-        python manage.py populate_fake_user <total>
+        python manage.py populate_fake_user_bulk <total> [--batch-size N] [--loader orm|copy]
+            [--password-hashing MODE] [--seed N]
     
     Args:
         total (int): total numbers of fake data
     
     Example:
         To create 1000 fake users, run:
-            python manage.py populate_fake_user 1000
+            python manage.py populate_fake_user_bulk 1000
     """
     help = "Populate the database with fake user data"
 
@@ -33,6 +49,21 @@ class Command(BaseCommand):
             parser (ArgumentParser): The argument parser.
         """
         parser.add_argument("total", type=int, help="total: total number of fake user data")
+        parser.add_argument("--batch-size", type=int, default=1000, help="number of users inserted per batch")
+        parser.add_argument(
+            "--password-hashing",
+            choices=HASHING_MODES,
+            default="once",
+            help="hash the password once for all users, per user, or per user in a process pool",
+        )
+        parser.add_argument("--hash-workers", type=int, default=None, help="size of the password hashing pool")
+        parser.add_argument("--seed", type=int, default=None, help="seed for reproducible fake data")
+        parser.add_argument(
+            "--loader",
+            choices=["orm", "copy"],
+            default="orm",
+            help="insert with bulk_create or stream with COPY (falls back to bulk_create on SQLite)",
+        )
     
     def handle(self, *args, **kwargs):
         """
@@ -43,45 +74,35 @@ class Command(BaseCommand):
             kwargs: Additional keyword arguments
         """
         total = kwargs["total"]
-        fake = Faker()
+        batch_size = kwargs["batch_size"]
+        generator = UserDataGenerator(seed=kwargs["seed"], start=next_sequence_start(User))
+        passwords = PasswordFactory(mode=kwargs["password_hashing"], workers=kwargs["hash_workers"])
+        started = time.perf_counter()
 
-        unique_usernames = set()
-        # Create a list to hold the fake user objects
-        users = []
-        for _ in range(total):
-            fake_email = fake.email()
-            fake_username = self.generate_unique_username(fake, unique_usernames)
-            fake_full_name = fake.name()
-            fake_date_of_birth = fake.date_of_birth(minimum_age=18, maximum_age=80)
-            fake_phone_number = fake.phone_number()
-            fake_password = "Password@123"
-            user = User.objects.create_user(
-                email=fake_email,
-                username=fake_username,
-                full_name=fake_full_name,
-                date_of_birth=fake_date_of_birth,
-                phone_number=fake_phone_number,
-            )
-            user.set_password(fake_password)
-            users.append(user)
-        User.objects.bulk_create(users, ignore_conflicts=True)
+        created = 0
+        try:
+            # only one batch of unsaved users is held in memory at a time
+            for rows in generator.batches(total, batch_size):
+                hashes = passwords.hashes(len(rows))
+                with transaction.atomic():
+                    if kwargs["loader"] == "copy":
+                        load_users(rows, hashes, chunk_size=batch_size)
+                    else:
+                        batch = [User(password=password, **row) for row, password in zip(rows, hashes)]
+                        User.objects.bulk_create(batch, batch_size=batch_size)
+                        self.create_profiles(batch)
+                created += len(rows)
+                self.stdout.write(f'Inserted {created}/{total} users')
+        finally:
+            passwords.close()
+        self.stdout.write(hashing_report(passwords.mode, passwords.seconds, time.perf_counter() - started))
         self.stdout.write(self.style.SUCCESS(f'Successfully populated the database with {total} fake users'))
 
-    def generate_unique_username(self, fake, unique_usernames):
+    def create_profiles(self, users):
         """
-        Generate a unique username.
+        Create the profiles of bulk created users, which skip the post_save signal.
 
         Args:
-            fake (Faker): The Faker instance.
-            unique_usernames (set): A set of unique usernames.
-
-        Returns:
-            str: A unique username.
+            users (list): Users inserted with bulk_create.
         """
-
-        while True:
-            fake_username = fake.user_name()
-            if fake_username not in unique_usernames:
-                unique_usernames.add(fake_username)
-                return fake_username
-            
\ No newline at end of file
+        Profile.objects.provision(User.objects.filter(username__in=[user.username for user in users]))
@@ -0,0 +1,192 @@
+"""
+    This module is management command for estimating the cost of the legacy user data migration
+"""
+import math
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from account.backfill import USER_COPY_FIELDS, copy_user_batch, copy_user_range_sql
+from account.instrumentation import MigrationProgress
+from account.models import User, NewUser, Profile
+
+
+def database_size():
+    """
+    Return the current size of the new user and profile tables in bytes, or
+    of the whole database file on SQLite.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT pg_total_relation_size(%s) + pg_total_relation_size(%s)",
+                [NewUser._meta.db_table, Profile._meta.db_table],
+            )
+            return cursor.fetchone()[0]
+        if connection.vendor == "sqlite":
+            cursor.execute("PRAGMA page_count")
+            page_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            return page_count * cursor.fetchone()[0]
+    return None
+
+
+def wal_position():
+    """
+    Return the current PostgreSQL write-ahead log position, None on other backends.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+        return cursor.fetchone()[0]
+
+
+def wal_bytes_since(position):
+    """
+    Return the number of write-ahead log bytes written since a position.
+
+    Args:
+        position (str): A position returned by wal_position.
+    """
+    if position is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", [position])
+        return int(cursor.fetchone()[0])
+
+
+def sample_windows(total, batches, batch_size):
+    """
+    Return evenly spaced row windows to read the sample batches from.
+
+    The windows are spaced by row position rather than by primary key, so
+    gaps in the primary keys cannot make two batches read the same rows.
+
+    Args:
+        total (int): Number of rows to sample from.
+        batches (int): Number of sample batches.
+        batch_size (int): Number of rows per batch.
+
+    Returns:
+        list: (offset, limit) pairs of non-overlapping windows.
+    """
+    step = max(1, total // batches)
+    limit = min(batch_size, step)
+    return [(index * step, limit) for index in range(min(batches, total))]
+
+
+def format_bytes(size):
+    """
+    Format a byte count for humans.
+    """
+    if size is None:
+        return "n/a"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to dry run the legacy user copy on a sample and project its cost
+
+    The sample is copied inside a transaction that is always rolled back, so
+    the database is left unchanged.
+
+    Usuage:
+        python manage.py project_user_migration [--sample PERCENT] [--batch-size N] [--budget SECONDS]
+
+    Example:
+        To copy 1% of the legacy users and check the copy fits into one hour, run:
+            python manage.py project_user_migration --sample 1 --budget 3600
+    """
+    help = "Copy a sample of legacy users in a rolled back transaction and project the full migration cost"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--sample", type=float, default=1.0, help="percentage of legacy users to copy")
+        parser.add_argument("--batch-size", type=int, default=1000, help="number of rows copied per batch")
+        parser.add_argument("--budget", type=float, default=None, help="allowed wall time of the migration in seconds")
+        parser.add_argument(
+            "--fast-path",
+            choices=["auto", "on", "off"],
+            default="auto",
+            help="use the INSERT ... SELECT copy (auto: PostgreSQL only)",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        batch_size = kwargs["batch_size"]
+        fast_path = {"auto": connection.vendor == "postgresql", "on": True, "off": False}[kwargs["fast_path"]]
+
+        # users copied by an earlier run are skipped by the real migration too
+        pending = User.objects.exclude(username__in=NewUser.objects.values("username")).order_by("pk")
+        total = pending.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS("No legacy users to copy"))
+            return
+        sample_rows = max(1, math.ceil(total * kwargs["sample"] / 100))
+        # every window is read before copying, the copies shift the row positions of the pending users
+        samples = [
+            list(pending.values("id", *USER_COPY_FIELDS)[offset:offset + limit])
+            for offset, limit in sample_windows(total, math.ceil(sample_rows / batch_size), batch_size)
+        ]
+
+        progress = MigrationProgress("project_user_migration")
+        progress.start(sum(len(rows) for rows in samples))
+        with transaction.atomic():
+            size_before = database_size()
+            wal_before = wal_position()
+            with progress.track_queries():
+                for rows in samples:
+                    # each sample batch runs in a savepoint like a real batch transaction
+                    with progress.batch(len(rows)), transaction.atomic():
+                        if fast_path:
+                            copy_user_range_sql(rows[0]["id"] - 1, rows[-1]["id"], User, NewUser, Profile)
+                        else:
+                            copy_user_batch(rows, NewUser, Profile)
+            size_growth = database_size() - size_before if size_before is not None else None
+            wal_growth = wal_bytes_since(wal_before)
+            transaction.set_rollback(True)
+        summary = progress.finish()
+
+        copied = summary["rows"]
+        if not copied:
+            self.stdout.write(self.style.WARNING("The sample did not contain any rows"))
+            return
+        scale = total / copied
+        batch_seconds = [batch["seconds"] for batch in summary["batches"]]
+        projected_seconds = sum(batch_seconds) * scale
+        self.stdout.write(f"Sampled {copied} of {total} legacy users in {len(batch_seconds)} batches")
+        self.stdout.write(f"Projected wall time: {projected_seconds:.1f}s")
+        # lock time is not measured, a batch holds its row locks at most until it commits
+        self.stdout.write(f"Longest batch transaction: {max(batch_seconds):.3f}s")
+        self.stdout.write(f"Projected queries: {math.ceil(summary['queries'] * scale)}")
+        self.stdout.write(
+            f"Projected WAL volume: {format_bytes(wal_growth * scale if wal_growth is not None else None)}"
+        )
+        self.stdout.write(
+            f"Projected disk growth: {format_bytes(size_growth * scale if size_growth is not None else None)}"
+        )
+
+        budget = kwargs["budget"]
+        if budget is None:
+            return
+        if projected_seconds <= budget:
+            self.stdout.write(self.style.SUCCESS(f"GO: projected {projected_seconds:.1f}s fits the {budget:.0f}s budget"))
+        else:
+            self.stdout.write(self.style.ERROR(f"NO-GO: projected {projected_seconds:.1f}s exceeds the {budget:.0f}s budget"))
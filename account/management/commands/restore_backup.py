@@ -0,0 +1,167 @@
+"""
+    This module is management command for restoring an export of export_tables
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from account.restore import (
+    clear_tables,
+    deferred_schema,
+    execute_statement,
+    finalize_restore,
+    load_chunk,
+    missing_schema,
+    read_manifest,
+)
+from account.table_export import verify_export
+
+
+def init_worker():
+    """
+    Set up django in a worker process. Each worker opens its own database connection.
+    """
+    django.setup()
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to restore an export written by export_tables
+
+    The secondary indexes, unique constraints and foreign keys of the
+    restored tables are dropped before the load and built again afterwards.
+    Chunks are loaded and indexes are built by a pool of worker processes.
+
+    Usuage:
+        python manage.py restore_backup <directory> [--workers N] [--replace] [--skip-verify]
+
+    Args:
+        directory (str): directory of the export
+
+    Example:
+        To restore an export with 8 worker processes, run:
+            python manage.py restore_backup data_backups/export-20240101T000000 --workers 8
+    """
+    help = "Restore an export of export_tables with parallel loading and deferred indexes"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("directory", help="directory of the export")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+        parser.add_argument("--replace", action="store_true", help="delete the rows of the restored tables first")
+        parser.add_argument("--skip-verify", action="store_true", help="do not check the chunk checksums first")
+
+    def run_tasks(self, workers, function, tasks):
+        """
+        Run function for every task, in a pool of worker processes if workers > 1.
+
+        Args:
+            workers (int): Number of worker processes.
+            function (callable): Top level function run for every task.
+            tasks (list): Argument tuples of the calls.
+
+        Returns:
+            list: The results, in completion order.
+        """
+        if workers == 1:
+            return [function(*task) for task in tasks]
+        # workers must not share the parent's connection, so close it before forking
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = [executor.submit(function, *task) for task in tasks]
+            return [future.result() for future in as_completed(futures)]
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        directory = kwargs["directory"]
+        workers = max(1, kwargs["workers"])
+        if workers > 1 and connection.vendor == "sqlite":
+            # sqlite allows a single writer, parallel workers would only fight over the lock
+            self.stdout.write(self.style.WARNING("SQLite does not support parallel writers, using 1 worker"))
+            workers = 1
+        phases = {}
+
+        started = time.perf_counter()
+        manifest = read_manifest(directory)
+        if not kwargs["skip_verify"]:
+            broken = verify_export(directory)
+            if broken:
+                raise CommandError(f"{len(broken)} chunks do not match the manifest: {', '.join(broken)}")
+        phases["verify"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        tables = list(manifest["tables"])
+        models = [apps.get_model(table["model"]) for table in manifest["tables"].values()]
+        if kwargs["replace"]:
+            try:
+                clear_tables(tables)
+            except ValueError as error:
+                raise CommandError(error) from error
+        else:
+            filled = [model._meta.db_table for model in models if model._base_manager.exists()]
+            if filled:
+                raise CommandError(f"Tables are not empty, use --replace: {', '.join(filled)}")
+        schema = deferred_schema(tables)
+        for sql in schema["drop"]:
+            execute_statement(sql)
+        phases["drop indexes"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # the largest chunks go first so the workers finish at about the same time
+        chunks = sorted(
+            (
+                (directory, table, chunk, manifest["null"])
+                for table in manifest["tables"].values()
+                for chunk in table["chunks"]
+            ),
+            key=lambda task: task[2]["bytes"],
+            reverse=True,
+        )
+        try:
+            with connection.constraint_checks_disabled():
+                results = self.run_tasks(workers, load_chunk, chunks)
+            rows = sum(result[1] for result in results)
+            phases["load"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            self.run_tasks(workers, execute_statement, [(sql,) for sql in schema["indexes"]])
+            phases["build indexes"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for sql in schema["constraints"]:
+                execute_statement(sql)
+            if connection.vendor != "postgresql":
+                connection.check_constraints(table_names=tables)
+            phases["add constraints"] = time.perf_counter() - started
+        except Exception:
+            self.stderr.write("Restore failed, the missing indexes and constraints are:")
+            for sql in missing_schema(schema, tables):
+                self.stderr.write(f"{sql};")
+            raise
+
+        started = time.perf_counter()
+        finalize_restore(models)
+        phases["finalize"] = time.perf_counter() - started
+
+        for phase, seconds in phases.items():
+            self.stdout.write(f"{phase}: {seconds:.2f}s")
+        total = sum(phases.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully restored {rows} rows into {len(tables)} tables in {total:.2f}s using {workers} workers"
+        ))
@@ -0,0 +1,62 @@
+"""
+    This module is management command for the online migration from the legacy user table
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from account import dual_write
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to control dual-write mode during the user backfill
+
+    Usuage:
+        python manage.py user_dual_write <enable|disable|cutover>
+
+    Args:
+        action (str): enable installs the mirroring trigger, disable removes it
+            and cutover copies the remaining delta and removes the trigger.
+
+    Example:
+        Install the trigger, backfill and then cut over:
+            python manage.py user_dual_write enable
+            python manage.py backfill_new_users --workers 8
+            python manage.py user_dual_write cutover
+    """
+    help = "Mirror legacy user writes into the new user table and cut over after the backfill"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("action", choices=["enable", "disable", "cutover"], help="action: dual-write action")
+        parser.add_argument("--batch-size", type=int, default=1000, help="number of users mirrored per statement")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        action = kwargs["action"]
+        if action == "cutover":
+            total = dual_write.cutover(batch_size=kwargs["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Cut-over complete, copied {total} remaining users"))
+            return
+
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                "Dual-write triggers require PostgreSQL, set USER_DUAL_WRITE=True to mirror writes with signals"
+            )
+        if action == "enable":
+            dual_write.install_triggers()
+            self.stdout.write(self.style.SUCCESS("Dual-write trigger installed on the legacy user table"))
+        else:
+            dual_write.remove_triggers()
+            self.stdout.write(self.style.SUCCESS("Dual-write trigger removed from the legacy user table"))
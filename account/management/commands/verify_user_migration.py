@@ -0,0 +1,57 @@
+"""
+    This module is management command for verifying the legacy user to new user data migration
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.models import User, NewUser
+from account.verification import verify_users
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to check that every legacy user was copied correctly
+
+    Usuage:
+        python manage.py verify_user_migration [--batch-size N]
+
+    Example:
+        To compare the tables in ranges of 50000 users, run:
+            python manage.py verify_user_migration --batch-size 50000
+    """
+    help = "Compare the legacy user table with the new user table using per range checksums"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("--batch-size", type=int, default=10000, help="number of users per checksum range")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        started = time.perf_counter()
+        ranges = 0
+        mismatched = 0
+        for start_pk, end_pk, mismatches in verify_users(User, NewUser, batch_size=kwargs["batch_size"]):
+            ranges += 1
+            if not mismatches:
+                continue
+            self.stdout.write(self.style.WARNING(f"Range {start_pk + 1}-{end_pk} differs"))
+            for username, fields in mismatches:
+                self.stdout.write(f"  {username}: {', '.join(fields)}")
+            mismatched += len(mismatches)
+        elapsed = time.perf_counter() - started
+
+        if mismatched:
+            raise CommandError(f"{mismatched} users differ between the legacy and new user tables")
+        self.stdout.write(self.style.SUCCESS(f"Verified {ranges} ranges in {elapsed:.2f}s, all users match"))
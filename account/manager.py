@@ -2,7 +2,109 @@
 This module contains the custom managers for models in this app.
 """
 
+import calendar
+
 from django.contrib.auth.models import BaseUserManager
+from django.db import connections, models, router
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from account.cache import user_cache
+
+# where users born on February 29 celebrate in years without that day
+LEAP_DAY_POLICIES = {"feb28": (2, 28), "mar1": (3, 1)}
+
+
+def birthday_dates(day, leap_day="feb28"):
+    """
+    Return the (month, day) pairs of the dates of birth that have their birthday on a day.
+
+    In years without February 29 users born on that day celebrate on
+    February 28 or March 1, depending on leap_day.
+
+    Args:
+        day (date): The day of the birthdays.
+        leap_day (str, optional): One of LEAP_DAY_POLICIES.
+
+    Returns:
+        list: (month, day) tuples.
+    """
+    dates = [(day.month, day.day)]
+    if not calendar.isleap(day.year) and (day.month, day.day) == LEAP_DAY_POLICIES[leap_day]:
+        dates.append((2, 29))
+    return dates
+
+
+def provision_profiles(profile_model, users, using="default"):
+    """
+    Create the missing profiles of a set of users with one INSERT ... SELECT statement.
+
+    Users that already have a profile are skipped, so the call is idempotent.
+    Works with historical models, so data migrations can use it as well.
+    The cached lookups of the users that got a profile are dropped.
+
+    Args:
+        profile_model (Model): The profile model.
+        users (QuerySet or iterable): A user queryset or user primary keys.
+        using (str, optional): The database alias.
+
+    Returns:
+        int: Number of profiles created.
+    """
+    connection = connections[using]
+    if isinstance(users, QuerySet):
+        subquery, params = users.values("pk").query.get_compiler(using).as_sql()
+    else:
+        user_ids = list(users)
+        if not user_ids:
+            return 0
+        subquery = ", ".join(["%s"] * len(user_ids))
+        params = tuple(user_ids)
+
+    profile_table = profile_model._meta.db_table
+    user_model = profile_model._meta.get_field("user").related_model
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    returning = connection.features.can_return_rows_from_bulk_insert
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {profile_table} (user_id, updated_at) "
+            f"SELECT u.id, %s FROM {user_model._meta.db_table} u "
+            f"WHERE u.id IN ({subquery}) "
+            f"AND NOT EXISTS (SELECT 1 FROM {profile_table} p WHERE p.user_id = u.id)"
+            + (" RETURNING user_id" if returning else ""),
+            (now, *params),
+        )
+        if returning:
+            user_ids = [user_id for user_id, in cursor.fetchall()]
+            created = len(user_ids)
+        else:
+            created = cursor.rowcount
+            user_ids = users.values_list("pk", flat=True) if isinstance(users, QuerySet) else user_ids
+    # the cached users were read without a profile
+    if created:
+        user_cache.invalidate(user_model, user_ids, using)
+    return created
+
+
+class ProfileManager(models.Manager):
+    """
+    Custom manager for Profile Model
+    """
+
+    def provision(self, users):
+        """
+        Create the missing profiles of a set of users in one statement.
+
+        Bulk paths such as bulk_create skip the post_save signal that
+        creates a profile for each new user, so they call this instead.
+
+        Args:
+            users (QuerySet or iterable): A user queryset or user primary keys.
+
+        Returns:
+            int: Number of profiles created.
+        """
+        return provision_profiles(self.model, users, using=self._db or router.db_for_write(self.model))
 
 
 class CustomUserManager(BaseUserManager):
@@ -10,6 +112,94 @@ class CustomUserManager(BaseUserManager):
     Custom manager for User Model
     """
 
+    def get_cached_by_username(self, username):
+        """
+        Return the user with a username, with its profile, from the user cache.
+
+        Args:
+            username (str): The user's username.
+
+        Returns:
+            A user instance
+
+        Raises
+            DoesNotExist: If there is no user with the username.
+        """
+        return user_cache.get(self.get_queryset(), "username", username)
+
+    def get_cached_by_email(self, email):
+        """
+        Return the user with an email address, with its profile, from the user cache.
+
+        Args:
+            email (str): The user email address
+
+        Returns:
+            A user instance
+
+        Raises
+            DoesNotExist: If there is no user with the email address.
+        """
+        return user_cache.get(self.get_queryset(), "email", email)
+
+    def cache_stats(self):
+        """
+        Return the hit and miss counters of the user cache.
+
+        Returns:
+            dict: Local hits, shared hits, misses and the hit ratio.
+        """
+        return user_cache.stats()
+
+    def birthdays_on(self, day=None, leap_day="feb28"):
+        """
+        Return the users having their birthday on a day.
+
+        The filter on the month and day of date_of_birth is served by the
+        birthday index instead of a scan of the table.
+
+        Args:
+            day (date, optional): The day of the birthdays, defaults to today.
+            leap_day (str, optional): Where February 29 birthdays fall in other years, "feb28" or "mar1".
+
+        Returns:
+            QuerySet: The users, ordered by id.
+        """
+        day = day or timezone.localdate()
+        condition = models.Q()
+        for month, day_of_month in birthday_dates(day, leap_day):
+            condition |= models.Q(date_of_birth__month=month, date_of_birth__day=day_of_month)
+        return self.get_queryset().filter(condition).order_by("pk")
+
+    def iter_birthday_batches(self, day=None, batch_size=1000, leap_day="feb28"):
+        """
+        Yield the users having their birthday on a day in batches.
+
+        Every batch is fetched with keyset pagination on id, so each query
+        is one range scan of the birthday index however deep the batch is.
+
+        Args:
+            day (date, optional): The day of the birthdays, defaults to today.
+            batch_size (int, optional): Number of users per batch.
+            leap_day (str, optional): Where February 29 birthdays fall in other years, "feb28" or "mar1".
+
+        Yields:
+            list: Up to batch_size users, ordered by id within each date of birth.
+        """
+        day = day or timezone.localdate()
+        for month, day_of_month in birthday_dates(day, leap_day):
+            users = self.get_queryset().filter(
+                date_of_birth__month=month, date_of_birth__day=day_of_month
+            ).order_by("pk")
+            last_pk = None
+            while True:
+                batch = users if last_pk is None else users.filter(pk__gt=last_pk)
+                batch = list(batch[:batch_size])
+                if not batch:
+                    break
+                yield batch
+                last_pk = batch[-1].pk
+
     def __create_user(
             self,
             email,
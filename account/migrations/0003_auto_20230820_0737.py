@@ -4,15 +4,26 @@ Writing custom migration script
 
 from django.db import migrations
 
+from account.backfill import copy_users
+from account.instrumentation import InstrumentedRunPython
 
-def copy_old_user_to_new_and_initite_profile(apps, schema_editor):
+# checkpoint key of the copy step in this migration
+COPY_STEP = "account.0003.copy_users"
+
+
+def copy_old_user_to_new_and_initite_profile(apps, schema_editor, progress=None):
     """
     Copies data from the old 'User' model to the new 'NewUser' model.
     Initializes corresponding 'Profile' instances.
 
+    Users are copied in batches of USER_MIGRATION_BATCH_SIZE rows. Every batch
+    commits on its own and records a checkpoint, so a failed run resumes from
+    the last copied primary key when the migration is applied again.
+
     Args:
         apps (object): The application registry.
         schema_editor (object): The schema editor.
+        progress (MigrationProgress, optional): Collects the metrics of every batch.
 
     Returns:
         None
@@ -22,31 +33,16 @@ def copy_old_user_to_new_and_initite_profile(apps, schema_editor):
     new_user = apps.get_model("account", "NewUser")
     new_user_profile = apps.get_model("account", "Profile")
 
-    # create a list of all users to migrate using bulk migrations
-    old_users = old_user.objects.all()
-    new_users = [
-        new_user(
-            email=old_user.email,
-            username=old_user.username,
-            full_name=old_user.full_name,
-            password=old_user.password,
-            phone_number=old_user.phone_number,
-            date_of_birth=old_user.date_of_birth,
-            is_active=old_user.is_active,
-            is_staff=old_user.is_staff,
-            is_superuser=old_user.is_superuser,
-        ) for old_user in old_users
-    ]
-    new_user.objects.bulk_create(new_users)
-
-    # Instantinate new profile for each users
-    profiles = [
-        new_user_profile(user=new_user)
-        for new_user in new_users
-    ]
-    new_user_profile.objects.bulk_create(profiles)
-
-
+    # stream the old users in primary key batches so memory stays flat
+    # no matter how large the table is
+    copy_users(
+        old_user,
+        new_user,
+        new_user_profile,
+        step=COPY_STEP,
+        using=schema_editor.connection.alias,
+        progress=progress,
+    )
 
 
 class Migration(migrations.Migration):
@@ -54,6 +50,9 @@ class Migration(migrations.Migration):
     Inlcude the custom migrations
     """
 
+    # batches commit independently so a failure does not roll back the whole copy
+    atomic = False
+
     # previous migration file that has not been applied yet
     dependencies = [
         ("account", "0002_newuser_profile"),
@@ -61,5 +60,5 @@ class Migration(migrations.Migration):
 
     # deine the custom function
     operations = [
-        migrations.RunPython(copy_old_user_to_new_and_initite_profile)
+        InstrumentedRunPython(copy_old_user_to_new_and_initite_profile, name=COPY_STEP)
     ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_activity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newuser',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('date_of_birth'), django.db.models.functions.datetime.ExtractDay('date_of_birth'), models.F('id'), name='account_newuser_birthday_idx'),
+        ),
+    ]
@@ -2,13 +2,14 @@
 This module contains database models for account app
 """
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, Group, Permission
 
 # third party import
 from phonenumber_field.modelfields import PhoneNumberField
 
 # Import custom user manager
-from account.manager import CustomUserManager
+from account.manager import CustomUserManager, ProfileManager
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -59,6 +60,21 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.username}"
 
 
+def with_updated_at(update_fields):
+    """
+    Add updated_at to the fields of a partial save.
+
+    Args:
+        update_fields (iterable): The update_fields passed to save(), None for a full save.
+
+    Returns:
+        The fields to save, unchanged for a full save or an empty update_fields.
+    """
+    if not update_fields:
+        return update_fields
+    return {*update_fields, "updated_at"}
+
+
 class NewUser(AbstractBaseUser, PermissionsMixin):
     """
     Custom User model for the application.
@@ -117,6 +133,18 @@ class NewUser(AbstractBaseUser, PermissionsMixin):
     # Define the required fields to use as the username when authenticating
     REQUIRED_FIELDS: list = ['email', 'full_name', 'date_of_birth', 'phone_number']
 
+    class Meta:
+        indexes = [
+            # serves "whose birthday is today" with keyset pagination on id,
+            # a plain index on date_of_birth cannot be used for month and day
+            models.Index(
+                ExtractMonth("date_of_birth"),
+                ExtractDay("date_of_birth"),
+                "id",
+                name="account_newuser_birthday_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         """
         Return the username as a string representation of the user.
@@ -126,6 +154,16 @@ class NewUser(AbstractBaseUser, PermissionsMixin):
         """
         return f"{self.username}"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the user and bump updated_at also when only some fields are saved.
+
+        auto_now is only written with the saved fields, and update_last_login
+        saves just last_login, so the incremental export would miss the change.
+        """
+        kwargs["update_fields"] = with_updated_at(kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class Profile(models.Model):
     """
@@ -137,12 +175,21 @@ class Profile(models.Model):
     avatar = models.ImageField(upload_to="user/profile/avatar", null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProfileManager()
+
     def __str__(self):
         """
         Return a string
         """
         return f"{self.user.username}"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the profile and bump updated_at also when only some fields are saved.
+        """
+        kwargs["update_fields"] = with_updated_at(kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class Activity(models.Model):
     """
@@ -0,0 +1,289 @@
+"""
+This module contains helpers for restoring an export written by export_tables.
+
+Loading rows into a table is much faster without its secondary indexes and
+foreign keys, so the restore drops them first, loads the chunks and builds
+them again once all data is in place.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections
+
+from account.loaders import COPY_NULL
+from account.table_export import MANIFEST_NAME
+
+# number of rows inserted per statement on backends without COPY
+RESTORE_BATCH_SIZE = 1000
+
+
+def read_manifest(directory):
+    """
+    Return the manifest of an export.
+
+    Args:
+        directory (str): Directory of the export.
+
+    Returns:
+        dict: The manifest.
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as file:
+        return json.load(file)
+
+
+def deferred_schema(tables, using="default"):
+    """
+    Collect the secondary indexes and constraints of tables that can be built after the load.
+
+    Primary keys are kept. On PostgreSQL unique constraints, foreign keys and
+    plain indexes are deferred. SQLite cannot drop constraints, so only its
+    plain indexes are deferred and foreign key checks are disabled instead.
+
+    Args:
+        tables (list): Table names.
+        using (str, optional): The database alias.
+
+    Returns:
+        dict: "drop", "indexes" and "constraints" lists of SQL statements.
+            The drop statements must run in order, the index statements can
+            run in parallel and the constraint statements must run last.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    foreign_keys, drop_constraints, drop_indexes = [], [], []
+    indexes, constraints = [], []
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                    "WHERE conrelid = %s::regclass AND contype IN ('u', 'f')",
+                    [table],
+                )
+                for name, kind, definition in cursor.fetchall():
+                    drop = f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}"
+                    create = f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+                    if kind == "f":
+                        foreign_keys.append(drop)
+                        constraints.append(create)
+                    else:
+                        drop_constraints.append(drop)
+                        indexes.append(create)
+                cursor.execute(
+                    "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+                    "JOIN pg_class i ON i.oid = x.indexrelid "
+                    "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary "
+                    "AND NOT EXISTS (SELECT 1 FROM pg_constraint c "
+                    "WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid)",
+                    [table],
+                )
+            else:
+                # indexes created inline with the table have no sql and cannot be dropped
+                cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                    [table],
+                )
+            for name, definition in cursor.fetchall():
+                drop_indexes.append(f"DROP INDEX {quote(name)}")
+                indexes.append(definition)
+    # foreign keys go first, they may depend on the unique constraints
+    return {
+        "drop": foreign_keys + drop_constraints + drop_indexes,
+        "indexes": indexes,
+        "constraints": constraints,
+    }
+
+
+def missing_schema(schema, tables, using="default"):
+    """
+    Return the deferred index and constraint statements whose objects do not exist.
+
+    Args:
+        schema (dict): The deferred schema collected before the load.
+        tables (list): Table names.
+        using (str, optional): The database alias.
+
+    Returns:
+        list: The statements still to run, indexes before constraints.
+    """
+    current = deferred_schema(tables, using)
+    present = set(current["indexes"] + current["constraints"])
+    return [sql for sql in schema["indexes"] + schema["constraints"] if sql not in present]
+
+
+def execute_statement(sql, using="default"):
+    """
+    Run one schema statement. Runs in the command process or in a worker process.
+
+    Args:
+        sql (str): The statement.
+        using (str, optional): The database alias.
+
+    Returns:
+        tuple: (statement, seconds spent)
+    """
+    started = time.perf_counter()
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql)
+    return sql, time.perf_counter() - started
+
+
+def copy_chunk_from(cursor, table, columns, file):
+    """
+    Stream a CSV chunk into a PostgreSQL table with COPY FROM STDIN.
+
+    Args:
+        cursor (CursorWrapper): A cursor on a PostgreSQL connection.
+        table (str): The table name.
+        columns (list): Column names, in the order of the CSV fields.
+        file (file): The uncompressed CSV data, opened in binary mode.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy"):
+        # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            for block in iter(lambda: file.read(2 ** 20), b""):
+                copy.write(block)
+    else:
+        # psycopg2
+        raw_cursor.copy_expert(sql, file)
+
+
+def insert_chunk(model, columns, file, null, using="default"):
+    """
+    Insert a CSV chunk with batched INSERT statements, for backends without COPY.
+
+    The values are inserted as exported, auto_now fields are not touched.
+
+    Args:
+        model (Model): The model whose table is loaded.
+        columns (list): Column names, in the order of the CSV fields.
+        file (file): The uncompressed CSV data, opened in binary mode.
+        null (str): The marker of NULL values.
+        using (str, optional): The database alias.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    by_column = {field.column: field for field in model._meta.concrete_fields}
+    fields = [by_column[column] for column in columns]
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    rows = csv.reader(io.TextIOWrapper(file, encoding="utf-8", newline=""))
+    with connection.cursor() as cursor:
+        while True:
+            batch = [
+                [
+                    None if value == null else field.get_db_prep_save(field.to_python(value), connection)
+                    for field, value in zip(fields, values)
+                ]
+                for values in islice(rows, RESTORE_BATCH_SIZE)
+            ]
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+
+
+def load_chunk(directory, table, chunk, null=COPY_NULL, using="default"):
+    """
+    Load one chunk of an export. Runs in the command process or in a worker process.
+
+    Args:
+        directory (str): Directory of the export.
+        table (dict): The manifest entry of the table.
+        chunk (dict): The manifest entry of the chunk.
+        null (str, optional): The marker of NULL values.
+        using (str, optional): The database alias.
+
+    Returns:
+        tuple: (file name, rows loaded, seconds spent)
+    """
+    started = time.perf_counter()
+    connection = connections[using]
+    model = apps.get_model(table["model"])
+    with gzip.open(os.path.join(directory, chunk["file"]), "rb") as file:
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                copy_chunk_from(cursor, model._meta.db_table, table["columns"], file)
+        else:
+            insert_chunk(model, table["columns"], file, null, using)
+    return chunk["file"], chunk["rows"], time.perf_counter() - started
+
+
+def referencing_tables(tables, using="default"):
+    """
+    Return the tables outside of tables that have foreign keys into them.
+
+    Args:
+        tables (list): Table names.
+        using (str, optional): The database alias.
+
+    Returns:
+        list: Names of the referencing tables.
+    """
+    connection = connections[using]
+    referencing = []
+    with connection.cursor() as cursor:
+        for table in connection.introspection.table_names(cursor):
+            if table in tables:
+                continue
+            relations = connection.introspection.get_relations(cursor, table)
+            if any(referenced in tables for _, referenced in relations.values()):
+                referencing.append(table)
+    return referencing
+
+
+def clear_tables(tables, using="default"):
+    """
+    Delete every row of tables before a restore.
+
+    Rows of tables outside of the export are never deleted. Empty tables that
+    reference the cleared tables are truncated with them, because PostgreSQL
+    cannot truncate a referenced table on its own.
+
+    Args:
+        tables (list): Table names.
+        using (str, optional): The database alias.
+
+    Raises:
+        ValueError: If a table outside of tables has rows referencing them.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    referencing = referencing_tables(tables, using)
+    with connection.cursor() as cursor:
+        filled = []
+        for table in referencing:
+            cursor.execute(f"SELECT 1 FROM {quote(table)} LIMIT 1")
+            if cursor.fetchone():
+                filled.append(table)
+    if filled:
+        raise ValueError(f"Tables outside of the export reference the restored tables: {', '.join(filled)}")
+    statements = connection.ops.sql_flush(no_style(), list(tables) + referencing)
+    connection.ops.execute_sql_flush(statements)
+
+
+def finalize_restore(models, using="default"):
+    """
+    Reset the primary key sequences and refresh the planner statistics.
+
+    Args:
+        models (list): The restored models.
+        using (str, optional): The database alias.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+        if connection.vendor == "postgresql":
+            for model in models:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
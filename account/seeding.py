@@ -0,0 +1,424 @@
+"""
+This module contains helpers shared by the commands that seed fake users.
+"""
+import datetime
+import random
+import time
+from multiprocessing import Pool
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from account.loaders import copy_rows
+from account.models import NewUser, Profile
+
+# numpy is optional, it speeds up sampling large batches
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# plain text password of every seeded user
+SEED_PASSWORD = "Password@123"
+
+# supported ways of hashing the seed password
+HASHING_MODES = ["once", "per-user", "pool"]
+
+# prefixes of Nepali mobile numbers, followed by 7 digits
+NP_MOBILE_PREFIXES = ["980", "981", "982", "984", "985", "986"]
+
+# digits used to encode the sequence number in usernames
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+# user columns written by load_users
+USER_LOAD_FIELDS = [
+    "username",
+    "email",
+    "full_name",
+    "date_of_birth",
+    "phone_number",
+    "password",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "joined_at",
+    "updated_at",
+]
+
+
+class PasswordFactory:
+    """
+    Produce password hashes for seeded users and measure the time spent hashing.
+
+    Modes:
+        once: hash the password once and reuse the hash for every user.
+        per-user: hash the password with a fresh salt for every user, serially.
+        pool: hash the password with a fresh salt for every user in a process pool.
+
+    Attributes:
+        seconds (float): Total time spent producing hashes.
+    """
+
+    def __init__(self, password=SEED_PASSWORD, mode="once", workers=None):
+        if mode not in HASHING_MODES:
+            raise ValueError(f"Unknown password hashing mode: {mode}")
+        self.password = password
+        self.mode = mode
+        self.workers = workers
+        self.seconds = 0.0
+        self._hash = None
+        self._pool = None
+
+    def hashes(self, count):
+        """
+        Return password hashes for a batch of users.
+
+        Args:
+            count (int): Number of hashes.
+
+        Returns:
+            list: The password hashes.
+        """
+        started = time.perf_counter()
+        if self.mode == "once":
+            if self._hash is None:
+                self._hash = make_password(self.password)
+            hashes = [self._hash] * count
+        elif self.mode == "per-user":
+            hashes = [make_password(self.password) for _ in range(count)]
+        else:
+            if self._pool is None:
+                self._pool = Pool(self.workers, initializer=django.setup)
+            hashes = self._pool.map(make_password, [self.password] * count)
+        self.seconds += time.perf_counter() - started
+        return hashes
+
+    def close(self):
+        """
+        Shut the process pool down, if one was started.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def hashing_report(mode, hashing_seconds, total_seconds):
+    """
+    Describe how much of a seeding run was spent hashing passwords.
+
+    Args:
+        mode (str): The password hashing mode.
+        hashing_seconds (float): Time spent hashing.
+        total_seconds (float): Wall time of the whole run.
+
+    Returns:
+        str: A one line report.
+    """
+    share = hashing_seconds / total_seconds * 100 if total_seconds else 0
+    return (
+        f"Password hashing ({mode}) took {hashing_seconds:.2f}s "
+        f"of {total_seconds:.2f}s total ({share:.0f}%)"
+    )
+
+
+def next_sequence_start(model):
+    """
+    Return a sequence start above every sequence number used by earlier runs.
+
+    Earlier runs started at the highest primary key plus one and inserted
+    one row per sequence number, so the highest primary key is never below
+    a sequence number that is already in use.
+
+    Args:
+        model (Model): The seeded user model.
+
+    Returns:
+        int: The sequence number for the first generated user.
+    """
+    return (model.objects.aggregate(max_pk=Max("pk"))["max_pk"] or 0) + 1
+
+
+def base36(number):
+    """
+    Encode a non negative integer in base 36.
+
+    Args:
+        number (int): The number to encode.
+
+    Returns:
+        str: The encoded number.
+    """
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(BASE36_DIGITS[remainder])
+        if not number:
+            return "".join(reversed(digits))
+
+
+class UserDataGenerator:
+    """
+    Generate columns of fake user data a whole batch at a time.
+
+    Names and email domains are drawn from pools that are built once with
+    Faker, instead of calling Faker for every field of every row. Every
+    username ends with its base 36 encoded sequence number, so usernames
+    and the emails derived from them are unique without any retries. The
+    same seed, start and today always produce the same rows.
+
+    Attributes:
+        sequence (int): Sequence number of the next generated user.
+    """
+
+    def __init__(self, seed=None, start=1, pool_size=1000, namespace="", today=None):
+        """
+        Args:
+            seed (int, optional): Seed for deterministic output.
+            start (int, optional): Sequence number of the first user.
+            pool_size (int, optional): Number of first names, last names and domains to sample from.
+            namespace (str, optional): Prefix of the encoded sequence number.
+            today (date, optional): Reference date for the dates of birth.
+        """
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.first_names = sorted({fake.first_name() for _ in range(pool_size)})
+        self.last_names = sorted({fake.last_name() for _ in range(pool_size)})
+        self.domains = sorted({fake.free_email_domain() for _ in range(pool_size // 10 or 1)})
+        self.sequence = start
+        self.namespace = namespace
+        self.today = today or datetime.date.today()
+        if numpy is not None:
+            self._numpy_random = numpy.random.default_rng(seed)
+        self._random = random.Random(seed)
+
+    def _integers(self, high, count):
+        """
+        Return count random integers in [0, high).
+        """
+        if numpy is not None:
+            return self._numpy_random.integers(0, high, size=count).tolist()
+        return [self._random.randrange(high) for _ in range(count)]
+
+    def columns(self, count):
+        """
+        Generate the next batch of users as columns.
+
+        Args:
+            count (int): Number of users.
+
+        Returns:
+            dict: Lists keyed by user field name.
+        """
+        first_names = [self.first_names[index] for index in self._integers(len(self.first_names), count)]
+        last_names = [self.last_names[index] for index in self._integers(len(self.last_names), count)]
+        domains = [self.domains[index] for index in self._integers(len(self.domains), count)]
+        # ages between 18 and 80 years
+        age_days = self._integers(62 * 365, count)
+        prefixes = self._integers(len(NP_MOBILE_PREFIXES), count)
+        subscribers = self._integers(10 ** 7, count)
+
+        sequences = range(self.sequence, self.sequence + count)
+        self.sequence += count
+        usernames = [
+            "".join(filter(str.isalnum, f"{first}{last}")).lower()[:20] + f"_{self.namespace}{base36(sequence)}"
+            for first, last, sequence in zip(first_names, last_names, sequences)
+        ]
+        youngest = self.today - datetime.timedelta(days=18 * 365)
+        return {
+            "username": usernames,
+            "email": [f"{username}@{domain}" for username, domain in zip(usernames, domains)],
+            "full_name": [f"{first} {last}" for first, last in zip(first_names, last_names)],
+            "date_of_birth": [youngest - datetime.timedelta(days=days) for days in age_days],
+            "phone_number": [
+                f"+977{NP_MOBILE_PREFIXES[prefix]}{subscriber:07d}"
+                for prefix, subscriber in zip(prefixes, subscribers)
+            ],
+        }
+
+    def rows(self, count):
+        """
+        Generate the next batch of users as row dicts.
+
+        Args:
+            count (int): Number of users.
+
+        Returns:
+            list: One dict of user fields per user.
+        """
+        columns = self.columns(count)
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def batches(self, total, batch_size):
+        """
+        Yield row batches until total users were generated.
+
+        Args:
+            total (int): Number of users.
+            batch_size (int): Number of users per batch.
+
+        Yields:
+            list: Row dicts as returned by rows.
+        """
+        for offset in range(0, total, batch_size):
+            yield self.rows(min(batch_size, total - offset))
+
+
+def load_users(rows, hashes, chunk_size=10000, using="default"):
+    """
+    Load generated users and their profiles with the copy loader.
+
+    Args:
+        rows (list): Generated user rows.
+        hashes (list): Password hashes, one per row.
+        chunk_size (int, optional): Number of rows per COPY chunk.
+        using (str, optional): The database alias.
+
+    Returns:
+        list: Primary keys of the loaded users.
+    """
+    now = timezone.now()
+    copy_rows(
+        NewUser,
+        USER_LOAD_FIELDS,
+        (
+            (
+                row["username"], row["email"], row["full_name"], row["date_of_birth"],
+                row["phone_number"], password, True, False, False, now, now,
+            )
+            for row, password in zip(rows, hashes)
+        ),
+        chunk_size=chunk_size,
+        using=using,
+    )
+    user_ids = list(
+        NewUser.objects.using(using)
+        .filter(username__in=[row["username"] for row in rows])
+        .values_list("pk", flat=True)
+    )
+    Profile.objects.db_manager(using).provision(user_ids)
+    return user_ids
+
+
+# per user distributions of the related tables for generate_dataset.
+# counts are drawn uniformly between the bounds, activity and notification
+# timestamps are skewed towards the most recent days
+DATASET_PROFILES = {
+    "minimal": {
+        "addresses": (1, 1),
+        "notifications": (0, 2),
+        "read_ratio": 0.5,
+        "activities": (0, 2),
+        "history_days": 30,
+    },
+    "realistic": {
+        "addresses": (0, 3),
+        "notifications": (0, 25),
+        "read_ratio": 0.7,
+        "activities": (0, 40),
+        "history_days": 365,
+    },
+}
+
+# cities with their province, used for fake addresses
+NP_CITIES = [
+    ("Kathmandu", "Bagmati", 44600),
+    ("Lalitpur", "Bagmati", 44700),
+    ("Bhaktapur", "Bagmati", 44800),
+    ("Pokhara", "Gandaki", 33700),
+    ("Biratnagar", "Koshi", 56613),
+    ("Birgunj", "Madhesh", 44300),
+    ("Butwal", "Lumbini", 32907),
+    ("Dharan", "Koshi", 56700),
+    ("Nepalgunj", "Lumbini", 21900),
+    ("Dhangadhi", "Sudurpashchim", 10900),
+]
+
+ACTIVITY_TYPES = ["login", "logout", "profile_update", "password_change"]
+ACTIVITY_WEIGHTS = [60, 25, 10, 5]
+
+NOTIFICATION_MESSAGES = [
+    "Welcome back! Check out what is new.",
+    "Your profile was updated successfully.",
+    "You have a new follower.",
+    "Happy birthday from all of us!",
+    "Your password was changed.",
+]
+
+
+class RelatedDataGenerator:
+    """
+    Generate address, notification and activity rows for a batch of users.
+
+    Rows are tuples in the column order of ADDRESS_FIELDS, NOTIFICATION_FIELDS
+    and ACTIVITY_FIELDS, ready for the copy loader.
+    """
+
+    ADDRESS_FIELDS = ["user_id", "street_address", "city", "state", "postal_code", "country"]
+    NOTIFICATION_FIELDS = ["user_id", "message_body", "is_read", "timestamp"]
+    ACTIVITY_FIELDS = ["user_id", "activity_type", "timestamp"]
+
+    def __init__(self, distribution, seed=None, now=None):
+        """
+        Args:
+            distribution (dict): Per user distribution, see DATASET_PROFILES.
+            seed (int, optional): Seed for deterministic output.
+            now (datetime, optional): Newest timestamp of the generated history.
+        """
+        self.distribution = distribution
+        self.random = random.Random(seed)
+        self.now = now or timezone.now()
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.street_names = sorted({fake.street_name() for _ in range(200)})
+
+    def _count(self, key):
+        """
+        Return a per user row count for one of the related tables.
+        """
+        low, high = self.distribution[key]
+        return self.random.randint(low, high)
+
+    def _timestamp(self):
+        """
+        Return a timestamp within the history window, skewed towards now.
+        """
+        days = self.distribution["history_days"]
+        age = min(self.random.expovariate(5 / days), days)
+        return self.now - datetime.timedelta(days=age)
+
+    def addresses(self, user_ids):
+        """
+        Yield address rows for a batch of users.
+        """
+        for user_id in user_ids:
+            for _ in range(self._count("addresses")):
+                city, state, postal_code = self.random.choice(NP_CITIES)
+                street = f"{self.random.randint(1, 999)} {self.random.choice(self.street_names)}"
+                yield user_id, street, city, state, postal_code, "Nepal"
+
+    def notifications(self, user_ids):
+        """
+        Yield notification rows for a batch of users, read with the configured ratio.
+        """
+        read_ratio = self.distribution["read_ratio"]
+        for user_id in user_ids:
+            for _ in range(self._count("notifications")):
+                yield (
+                    user_id,
+                    self.random.choice(NOTIFICATION_MESSAGES),
+                    self.random.random() < read_ratio,
+                    self._timestamp(),
+                )
+
+    def activities(self, user_ids):
+        """
+        Yield activity rows for a batch of users.
+        """
+        for user_id in user_ids:
+            for _ in range(self._count("activities")):
+                activity_type = self.random.choices(ACTIVITY_TYPES, ACTIVITY_WEIGHTS)[0]
+                yield user_id, activity_type, self._timestamp()
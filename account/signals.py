@@ -1,13 +1,78 @@
-from django.db.models.signals import post_save
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in, user_logged_out
 
-from account.models import Profile
+from account import dual_write
+from account.activity import activity_writer
+from account.cache import user_cache
+from account.models import Profile, User as LegacyUser
 
 User = get_user_model()
 
+logger = logging.getLogger("account.migrations")
+
 @receiver(signal=post_save, sender=User)
 def save_profile(sender, instance, created, **kwargs):
     if created:
-        profile = Profile.objects.create(user=instance)
-        profile.save()
+        Profile.objects.create(user=instance)
+
+
+@receiver(signal=pre_save, sender=LegacyUser)
+def remember_legacy_username(sender, instance, **kwargs):
+    # keep the stored username so a rename can be followed in the new user table
+    if settings.USER_DUAL_WRITE and instance.pk:
+        instance._stored_username = (
+            LegacyUser.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+        )
+
+
+@receiver(signal=post_save, sender=LegacyUser)
+def mirror_legacy_user(sender, instance, using, **kwargs):
+    if not settings.USER_DUAL_WRITE:
+        return
+    # mirroring must never fail the legacy write, the cut-over copies what was missed
+    try:
+        with transaction.atomic(using=using):
+            stored_username = getattr(instance, "_stored_username", None)
+            if stored_username and stored_username != instance.username:
+                dual_write.rename_mirrored_user(stored_username, instance.username, using)
+            dual_write.mirror_legacy_users([instance.pk], using)
+    except DatabaseError:
+        logger.exception("Could not mirror legacy user %s", instance.username)
+
+
+@receiver(signal=post_delete, sender=LegacyUser)
+def remove_mirrored_user(sender, instance, using, **kwargs):
+    if not settings.USER_DUAL_WRITE:
+        return
+    try:
+        with transaction.atomic(using=using):
+            dual_write.remove_mirrored_users([instance.username], using)
+    except DatabaseError:
+        logger.exception("Could not remove mirrored user %s", instance.username)
+
+
+@receiver(signal=post_save, sender=User)
+@receiver(signal=post_delete, sender=User)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    user_cache.invalidate(User, [instance.pk], using)
+
+
+@receiver(signal=post_save, sender=Profile)
+@receiver(signal=post_delete, sender=Profile)
+def invalidate_cached_profile_user(sender, instance, using, **kwargs):
+    user_cache.invalidate(User, [instance.user_id], using)
+
+
+@receiver(signal=user_logged_in)
+@receiver(signal=user_logged_out)
+def record_login_activity(sender, request, user, **kwargs):
+    # queued in memory, the activity writer stores it outside the request
+    if isinstance(user, User):
+        activity_type = "login" if kwargs["signal"] is user_logged_in else "logout"
+        activity_writer.record(user.pk, activity_type)
@@ -0,0 +1,269 @@
+"""
+This module contains an in-process exporter that streams tables into chunk files.
+
+On PostgreSQL every table is streamed with COPY ... TO STDOUT, other backends
+read the rows with a cursor that fetches them in batches. The rows are written
+in the CSV format the copy loader reads, into gzip compressed chunks that are
+closed once they hold max_chunk_bytes of CSV. A manifest records the columns
+and row count of every table and the row count, size and sha256 checksum of
+every chunk. Memory use does not depend on the size of the tables.
+All tables are read in one transaction, so the export is a single snapshot.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.utils import timezone
+
+from account.loaders import COPY_NULL, to_copy_value
+
+# apps whose tables are exported by default
+EXPORT_APPS = ["account", "address", "notification"]
+
+MANIFEST_NAME = "manifest.json"
+
+# default amount of uncompressed CSV per chunk
+DEFAULT_CHUNK_BYTES = 64 * 2 ** 20
+
+
+def file_sha256(path):
+    """
+    Return the sha256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChunkedOutput:
+    """
+    File-like object that spreads CSV rows over size-bounded gzip chunks.
+
+    A new chunk is started before a write once the current chunk holds
+    max_chunk_bytes, so chunks always end on a row boundary as long as
+    every write is one or more whole rows.
+
+    Attributes:
+        chunks (list): Manifest entries of the closed chunks.
+        rows (int): Number of rows written.
+    """
+
+    def __init__(self, directory, name, max_chunk_bytes=DEFAULT_CHUNK_BYTES, compresslevel=6):
+        """
+        Args:
+            directory (str): Directory the chunks are written to.
+            name (str): Prefix of the chunk file names.
+            max_chunk_bytes (int, optional): Amount of uncompressed CSV per chunk.
+            compresslevel (int, optional): gzip compression level.
+        """
+        self.directory = directory
+        self.name = name
+        self.max_chunk_bytes = max_chunk_bytes
+        self.compresslevel = compresslevel
+        self.chunks = []
+        self.rows = 0
+        self.file = None
+        self.filename = None
+        self.chunk_rows = 0
+        self.chunk_bytes = 0
+
+    def write(self, data, rows=1):
+        """
+        Write whole CSV rows.
+
+        Args:
+            data (bytes or str): The encoded rows.
+            rows (int, optional): Number of rows in data.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        if self.file is None or self.chunk_bytes >= self.max_chunk_bytes:
+            self.close()
+            self.filename = f"{self.name}-{len(self.chunks):05d}.csv.gz"
+            # a fixed mtime keeps the checksum of identical data stable
+            self.file = gzip.GzipFile(
+                os.path.join(self.directory, self.filename), "wb", compresslevel=self.compresslevel, mtime=0
+            )
+        self.file.write(data)
+        self.chunk_bytes += len(data)
+        self.chunk_rows += rows
+        self.rows += rows
+
+    def close(self):
+        """
+        Close the current chunk and record it.
+        """
+        if self.file is None:
+            return
+        self.file.close()
+        path = os.path.join(self.directory, self.filename)
+        self.chunks.append({
+            "file": self.filename,
+            "rows": self.chunk_rows,
+            "bytes": os.path.getsize(path),
+            "sha256": file_sha256(path),
+        })
+        self.file = None
+        self.chunk_rows = 0
+        self.chunk_bytes = 0
+
+
+def copy_table_to(cursor, table, columns, order_by, output):
+    """
+    Stream a table from PostgreSQL with COPY ... TO STDOUT.
+
+    The server sends one message per row, every message is written to the
+    output as one row.
+
+    Args:
+        cursor (CursorWrapper): A cursor on a PostgreSQL connection.
+        table (str): The table name.
+        columns (list): Column names.
+        order_by (str): Column the rows are ordered by.
+        output (ChunkedOutput): Receives the rows.
+    """
+    sql = (
+        f"COPY (SELECT {', '.join(columns)} FROM {table} ORDER BY {order_by}) "
+        f"TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy"):
+        # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            for data in copy:
+                output.write(bytes(data))
+    else:
+        # psycopg2
+        raw_cursor.copy_expert(sql, output)
+
+
+def stream_table_rows(model, batch_size=2000, using="default"):
+    """
+    Yield the rows of a model's table as CSV, one encoded row at a time.
+
+    The queryset iterator uses a server side cursor where the backend has
+    one and fetches batch_size rows at a time.
+
+    Args:
+        model (Model): The model whose table is read.
+        batch_size (int, optional): Number of rows fetched at a time.
+        using (str, optional): The database alias.
+
+    Yields:
+        bytes: One CSV row.
+    """
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    queryset = model._base_manager.using(using).order_by("pk").values_list(*attnames)
+    for values in queryset.iterator(chunk_size=batch_size):
+        writer.writerow([to_copy_value(value) for value in values])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_models(app_labels=None):
+    """
+    Return the models whose tables are exported, including many to many tables.
+
+    Args:
+        app_labels (list, optional): App labels, defaults to EXPORT_APPS.
+
+    Returns:
+        list: The models.
+    """
+    models = []
+    for label in app_labels or EXPORT_APPS:
+        for model in apps.get_app_config(label).get_models(include_auto_created=True):
+            if model._meta.managed and not model._meta.proxy:
+                models.append(model)
+    return models
+
+
+def export_tables(directory, models=None, max_chunk_bytes=DEFAULT_CHUNK_BYTES, compresslevel=6,
+                  batch_size=2000, using="default"):
+    """
+    Export tables into chunk files and write their manifest.
+
+    Args:
+        directory (str): Directory the export is written to.
+        models (list, optional): Models whose tables are exported, defaults to export_models().
+        max_chunk_bytes (int, optional): Amount of uncompressed CSV per chunk.
+        compresslevel (int, optional): gzip compression level.
+        batch_size (int, optional): Number of rows fetched at a time on backends without COPY.
+        using (str, optional): The database alias.
+
+    Returns:
+        dict: The manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    connection = connections[using]
+    manifest = {
+        "created_at": timezone.now().isoformat(),
+        "vendor": connection.vendor,
+        "format": "csv",
+        "null": COPY_NULL,
+        "tables": {},
+    }
+    # one transaction reads every table from the same snapshot, so rows that
+    # reference each other across tables stay consistent
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if connection.vendor == "postgresql" and outermost:
+            with connection.cursor() as cursor:
+                # waits for a snapshot that cannot be affected by concurrent writes instead of failing
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE, READ ONLY, DEFERRABLE")
+        for model in models or export_models():
+            table = model._meta.db_table
+            columns = [field.column for field in model._meta.concrete_fields]
+            output = ChunkedOutput(directory, table, max_chunk_bytes, compresslevel)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    copy_table_to(cursor, table, columns, model._meta.pk.column, output)
+            else:
+                for row in stream_table_rows(model, batch_size, using):
+                    output.write(row)
+            output.close()
+            manifest["tables"][table] = {
+                "model": model._meta.label,
+                "columns": columns,
+                "rows": output.rows,
+                "chunks": output.chunks,
+            }
+
+    with open(os.path.join(directory, MANIFEST_NAME), "w") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def verify_export(directory):
+    """
+    Check the size and checksum of every chunk of an export against its manifest.
+
+    Args:
+        directory (str): Directory of the export.
+
+    Returns:
+        list: File names of the chunks that are missing or do not match.
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as file:
+        manifest = json.load(file)
+    broken = []
+    for table in manifest["tables"].values():
+        for chunk in table["chunks"]:
+            path = os.path.join(directory, chunk["file"])
+            if (
+                not os.path.isfile(path)
+                or os.path.getsize(path) != chunk["bytes"]
+                or file_sha256(path) != chunk["sha256"]
+            ):
+                broken.append(chunk["file"])
+    return broken
@@ -0,0 +1,101 @@
+"""
+Test the buffered activity writer
+"""
+import datetime
+import time
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from django.contrib.auth import get_user_model
+
+from account.activity import ActivityWriter
+from account.models import Activity
+
+User = get_user_model()
+
+
+def create_user(username="walker"):
+    return User.objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        full_name="Walker",
+        password="Password@123",
+        date_of_birth="1990-01-01",
+        phone_number="+9779841234567",
+    )
+
+
+class TestActivityWriter(TestCase):
+    """
+    Test buffering, thresholds and backpressure of the writer
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.writer = ActivityWriter(max_buffer=10, flush_size=3, enqueue_timeout=0, background=False)
+
+    def test_writes_when_flush_size_is_reached(self):
+        self.writer.record(self.user.pk, "update")
+        self.writer.record(self.user.pk, "update")
+        self.assertFalse(Activity.objects.exists())
+        self.writer.record(self.user.pk, "update")
+        self.assertEqual(Activity.objects.filter(user=self.user, activity_type="update").count(), 3)
+        self.assertEqual(self.writer.stats()["written"], 3)
+
+    def test_flush_writes_pending_activities(self):
+        timestamp = timezone.now() - datetime.timedelta(days=1)
+        self.writer.record(self.user.pk, "login", timestamp)
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(Activity.objects.get().timestamp, timestamp)
+
+    def test_drops_activities_when_queue_is_full(self):
+        writer = ActivityWriter(max_buffer=2, flush_size=10, enqueue_timeout=0, background=False)
+        results = [writer.record(self.user.pk, "update") for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(writer.stats()["dropped"], 1)
+        writer.close()
+        self.assertEqual(Activity.objects.count(), 2)
+
+    def test_failed_batch_is_retried_once(self):
+        writer = ActivityWriter(flush_size=10, background=False, retry_delay=0)
+        copy_rows = "account.activity.copy_rows"
+        with mock.patch(copy_rows, side_effect=[DatabaseError("connection lost"), 1]), self.assertLogs("account.activity"):
+            writer.record(self.user.pk, "update")
+            writer.flush()
+        self.assertEqual((writer.stats()["written"], writer.stats()["failed"]), (1, 0))
+
+        with mock.patch(copy_rows, side_effect=DatabaseError("connection lost")) as write, \
+                self.assertLogs("account.activity"):
+            writer.record(self.user.pk, "update")
+            writer.flush()
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual((writer.stats()["written"], writer.stats()["failed"]), (1, 1))
+
+    def test_login_is_recorded(self):
+        with mock.patch("account.signals.activity_writer", self.writer):
+            self.client.force_login(self.user)
+            self.client.logout()
+        self.writer.flush()
+        self.assertEqual(
+            list(Activity.objects.order_by("pk").values_list("activity_type", flat=True)), ["login", "logout"]
+        )
+
+
+class TestBackgroundActivityWriter(TransactionTestCase):
+    """
+    Test writing from the flush thread
+    """
+    def test_thread_writes_after_interval_and_close_flushes_the_rest(self):
+        user = create_user()
+        writer = ActivityWriter(flush_size=100, flush_interval=0.05)
+        writer.record(user.pk, "login")
+        deadline = time.monotonic() + 5
+        while not writer.stats()["written"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(Activity.objects.filter(user=user).count(), 1)
+        writer.record(user.pk, "logout")
+        writer.close()
+        self.assertFalse(writer.thread.is_alive())
+        self.assertEqual(Activity.objects.filter(user=user).count(), 2)
@@ -0,0 +1,135 @@
+"""
+Test copying legacy users into the new user table
+"""
+import json
+import tempfile
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+
+from account.backfill import copy_users, get_checkpoint, save_checkpoint
+from account.instrumentation import InstrumentedRunPython, MigrationProgress
+from account.models import User, NewUser, Profile
+
+
+migration_0003 = import_module("account.migrations.0003_auto_20230820_0737")
+
+
+class TestCopyOldUsers(TestCase):
+    """
+    Test the 0003 data migration copy
+    """
+    def setUp(self):
+        User.objects.bulk_create([
+            User(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                password="legacy-hash",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(7)
+        ])
+
+    def test_copy_in_batches(self):
+        """
+        Every legacy user is copied with a profile, whatever the batch size
+        """
+        with self.settings(USER_MIGRATION_BATCH_SIZE=3):
+            # the copy only needs the schema editor's connection
+            schema_editor = SimpleNamespace(connection=connection)
+            migration_0003.copy_old_user_to_new_and_initite_profile(apps, schema_editor)
+
+        self.assertEqual(NewUser.objects.filter(username__startswith="legacy").count(), 7)
+        self.assertEqual(Profile.objects.filter(user__username__startswith="legacy").count(), 7)
+        new_user = NewUser.objects.get(username="legacy3")
+        self.assertEqual(new_user.email, "legacy3@example.com")
+        self.assertEqual(new_user.password, "legacy-hash")
+
+    def test_rerun_is_noop(self):
+        """
+        Copying the same rows again does not duplicate users or profiles
+        """
+        copy_users(User, NewUser, Profile, step="test", batch_size=3)
+        save_checkpoint("test", 0)
+        copy_users(User, NewUser, Profile, step="test", batch_size=3)
+
+        self.assertEqual(NewUser.objects.filter(username__startswith="legacy").count(), 7)
+        self.assertEqual(Profile.objects.filter(user__username__startswith="legacy").count(), 7)
+
+    def test_resume_from_checkpoint(self):
+        """
+        A rerun only copies rows after the stored checkpoint
+        """
+        pks = list(User.objects.order_by("pk").values_list("pk", flat=True))
+        copy_users(User, NewUser, Profile, step="test", batch_size=2, end_pk=pks[3])
+        self.assertEqual(get_checkpoint("test"), pks[3])
+
+        copied = copy_users(User, NewUser, Profile, step="test", batch_size=2)
+        self.assertEqual(copied, 3)
+        self.assertEqual(get_checkpoint("test"), pks[-1])
+        self.assertEqual(NewUser.objects.filter(username__startswith="legacy").count(), 7)
+
+    def test_insert_select_fast_path(self):
+        """
+        The set-based copy creates the same users and profiles and can be rerun
+        """
+        copy_users(User, NewUser, Profile, step="test", batch_size=3, fast_path=True)
+        save_checkpoint("test", 0)
+        copy_users(User, NewUser, Profile, step="test", batch_size=3, fast_path=True)
+
+        self.assertEqual(NewUser.objects.filter(username__startswith="legacy").count(), 7)
+        self.assertEqual(Profile.objects.filter(user__username__startswith="legacy").count(), 7)
+        new_user = NewUser.objects.get(username="legacy5")
+        self.assertEqual(new_user.full_name, "Legacy User 5")
+        self.assertEqual(new_user.password, "legacy-hash")
+        self.assertIsNotNone(new_user.joined_at)
+
+    def test_duplicate_email_is_skipped(self):
+        """
+        A legacy email that is already taken skips that row instead of failing the batch
+        """
+        User.objects.filter(username="legacy2").update(email="legacy1@example.com")
+        for fast_path in (False, True):
+            NewUser.objects.all().delete()
+            save_checkpoint("test", 0)
+            with self.assertLogs("account.migrations", level="WARNING") as logs:
+                copy_users(User, NewUser, Profile, step="test", batch_size=3, fast_path=fast_path)
+            self.assertIn("1 legacy users were not copied", logs.output[0])
+            self.assertIn("legacy2", logs.output[0])
+            self.assertEqual(NewUser.objects.filter(username__startswith="legacy").count(), 6)
+            self.assertEqual(Profile.objects.filter(user__username__startswith="legacy").count(), 6)
+
+    def test_progress_metrics(self):
+        """
+        Every batch is measured and the summary is written as JSON
+        """
+        progress = MigrationProgress("copy_users")
+        with self.assertLogs("account.migrations", level="INFO"), progress.track_queries():
+            copy_users(User, NewUser, Profile, step="test", batch_size=3, progress=progress)
+        summary = progress.finish()
+
+        self.assertEqual(summary["total"], 7)
+        self.assertEqual(summary["rows"], 7)
+        self.assertEqual([batch["rows"] for batch in summary["batches"]], [3, 3, 1])
+        self.assertGreater(summary["queries"], 0)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(progress.write_summary(directory)) as file:
+                self.assertEqual(json.load(file)["rows"], 7)
+
+    def test_instrumented_run_python_deconstructs_to_migration_function(self):
+        """
+        The operation serializes the wrapped migration function, not its own wrapper
+        """
+        operation = InstrumentedRunPython(
+            migration_0003.copy_old_user_to_new_and_initite_profile, name=migration_0003.COPY_STEP
+        )
+        name, args, kwargs = operation.deconstruct()
+        self.assertEqual(name, "InstrumentedRunPython")
+        self.assertIs(kwargs["code"], migration_0003.copy_old_user_to_new_and_initite_profile)
+        self.assertEqual(kwargs["name"], migration_0003.COPY_STEP)
+        self.assertEqual(InstrumentedRunPython(*args, **kwargs).deconstruct(), (name, args, kwargs))
@@ -0,0 +1,72 @@
+"""
+Test the backup helpers
+"""
+import datetime
+import os
+import subprocess
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command, CommandError
+from django.test import SimpleTestCase
+
+from account.backups import (
+    EXPORT_PREFIX,
+    build_pg_dump_command,
+    list_backups,
+    path_size,
+    prune_backups,
+    timestamped_dir,
+)
+
+DATABASE = {"NAME": "app", "USER": "postgres", "HOST": "localhost", "PORT": 5432}
+
+
+class TestBackupHelpers(SimpleTestCase):
+    """
+    Test building pg_dump commands and pruning old backups
+    """
+    def test_parallel_directory_dump(self):
+        command = build_pg_dump_command(DATABASE, "out", dump_format="directory", jobs=4, compress=6)
+        self.assertEqual(command[-8:], ["-F", "d", "-f", "out", "-j", "4", "-Z", "6"])
+
+    def test_parallel_plain_dump_rejected(self):
+        with self.assertRaises(ValueError):
+            build_pg_dump_command(DATABASE, "out.sql", jobs=2)
+
+    def test_prune_keeps_newest(self):
+        with tempfile.TemporaryDirectory() as root:
+            start = datetime.datetime(2024, 1, 1)
+            for day in range(4):
+                path = timestamped_dir(root, start + datetime.timedelta(days=day))
+                os.makedirs(path)
+                with open(os.path.join(path, "dump.sql"), "w") as file:
+                    file.write("x" * 10)
+            os.makedirs(os.path.join(root, "manual"))
+            os.makedirs(timestamped_dir(root, start, prefix=EXPORT_PREFIX))
+
+            expired = prune_backups(root, keep=2)
+
+            self.assertEqual([os.path.basename(path) for path in expired], ["backup-20240101T000000", "backup-20240102T000000"])
+            self.assertEqual(len(list_backups(root)), 2)
+            self.assertTrue(os.path.isdir(os.path.join(root, "manual")))
+            # table exports are not counted as pg_dump backups
+            self.assertEqual([os.path.basename(path) for path in list_backups(root, EXPORT_PREFIX)], ["export-20240101T000000"])
+            self.assertEqual(path_size(root), 20)
+
+    def test_directory_format_requires_timestamped(self):
+        with self.assertRaisesMessage(CommandError, "--format directory requires --timestamped"):
+            call_command("backup_sql_postgres", "--format", "directory")
+
+    def test_failed_dump_is_removed(self):
+        def fail(command, **kwargs):
+            # pg_dump leaves a partial directory behind
+            os.makedirs(command[command.index("-f") + 1])
+            raise subprocess.CalledProcessError(1, command)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("subprocess.run", side_effect=fail), self.assertRaises(CommandError):
+                call_command(
+                    "backup_sql_postgres", "--format", "directory", "--timestamped", "--output-dir", directory
+                )
+            self.assertEqual(os.listdir(directory), [])
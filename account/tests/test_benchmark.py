@@ -0,0 +1,65 @@
+"""
+Test the benchmark scenarios and the benchmark command
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from account.benchmarks import BenchmarkSuite
+from account.models import NewUser, User as LegacyUser
+from notification.models import Notification
+
+
+class TestBenchmarkSuite(TestCase):
+    """
+    Test running every scenario on a small dataset
+    """
+    def test_scenarios(self):
+        suite = BenchmarkSuite(30, lookups=10, batch_size=7, seed=1)
+        results = {measurement.scenario: measurement for measurement in suite.run()}
+        self.assertEqual(list(results), BenchmarkSuite.SCENARIOS)
+        self.assertEqual(results["seed"].operations, 30)
+        self.assertEqual(results["copy_0003"].operations, 30)
+        self.assertEqual(results["lookup_username"].operations, 10)
+        self.assertEqual(results["lookup_username"].queries, 10)
+        self.assertEqual(results["notification_fanout"].operations, 60)
+        for measurement in results.values():
+            self.assertGreater(measurement.queries, 0)
+            self.assertGreater(measurement.peak_memory, 0)
+        # the memory runs are rolled back, only the timed runs leave data behind
+        self.assertEqual(NewUser.objects.filter(username__startswith="benchmark-").count(), 1)
+        self.assertEqual(Notification.objects.count(), 60)
+
+
+class TestBenchmarkCommand(TestCase):
+    """
+    Test the benchmark command report
+    """
+    def test_report(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "benchmark", "--scales", "10", "20", "--lookups", "5",
+                "--scenarios", "lookup_email", "admin_changelist",
+                "--output-dir", directory, stdout=out,
+            )
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            with open(os.path.join(directory, files[0])) as file:
+                report = json.load(file)
+
+        self.assertEqual(
+            [(result["users"], result["scenario"]) for result in report["results"]],
+            [(10, "seed"), (10, "lookup_email"), (10, "admin_changelist"),
+             (20, "seed"), (20, "lookup_email"), (20, "admin_changelist")],
+        )
+        self.assertEqual(report["vendor"], connection.vendor)
+        # every scale is rolled back
+        self.assertEqual(NewUser.objects.count(), 0)
+        self.assertEqual(LegacyUser.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
@@ -0,0 +1,104 @@
+"""
+Test the cached user lookups
+"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+
+from account.cache import LocalLRUCache, user_cache
+from account.models import Profile
+
+User = get_user_model()
+
+
+class TestLocalLRUCache(TestCase):
+    """
+    Test eviction and expiry of the in-process tier
+    """
+    def test_evicts_least_recently_used(self):
+        local = LocalLRUCache(maxsize=2, ttl=60)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+        self.assertEqual(local.get("a"), 1)
+        self.assertIsNone(local.get("b"))
+
+    def test_expires_after_ttl(self):
+        local = LocalLRUCache(maxsize=2, ttl=-1)
+        local.set("a", 1)
+        self.assertIsNone(local.get("a"))
+
+
+class TestCachedUserLookup(TestCase):
+    """
+    Test the two tier user cache of the user manager
+    """
+    def setUp(self):
+        cache.clear()
+        user_cache.local.clear()
+        user_cache.reset_stats()
+        self.user = User.objects.create_user(
+            email="cached@example.com",
+            username="cached",
+            full_name="Cached User",
+            password="Password@123",
+            date_of_birth="1990-01-01",
+            phone_number="+9779841234567",
+        )
+
+    def test_hits_after_first_lookup(self):
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get_cached_by_username("cached")
+            self.assertEqual(user.profile.user_id, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(User.objects.get_cached_by_username("cached").pk, self.user.pk)
+            self.assertEqual(User.objects.get_cached_by_email("cached@example.com").pk, self.user.pk)
+        stats = User.objects.cache_stats()
+        self.assertEqual((stats["local_hits"], stats["shared_hits"], stats["misses"]), (1, 1, 1))
+
+        user_cache.local.clear()
+        with self.assertNumQueries(0):
+            User.objects.get_cached_by_username("cached")
+        self.assertEqual(User.objects.cache_stats()["shared_hits"], 2)
+
+    def test_save_invalidates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get_cached_by_username("cached")
+        self.user.username = "renamed"
+        self.user.save()
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_cached_by_username("cached")
+        self.assertEqual(User.objects.get_cached_by_username("renamed").pk, self.user.pk)
+
+    def test_profile_save_and_delete_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get_cached_by_email("cached@example.com")
+        Profile.objects.filter(user=self.user).update(bio="old")
+        profile = Profile.objects.get(user=self.user)
+        profile.bio = "Hello"
+        profile.save()
+        self.assertEqual(User.objects.get_cached_by_email("cached@example.com").profile.bio, "Hello")
+        self.user.delete()
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_cached_by_email("cached@example.com")
+
+    def test_lookup_is_cached_on_commit_only(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            User.objects.get_cached_by_username("cached")
+        # the transaction did not commit, so nothing was cached
+        self.assertIsNone(cache.get(user_cache.key(User, "username", "cached")))
+        with self.assertNumQueries(1):
+            User.objects.get_cached_by_username("cached")
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.full_name = "Renamed User"
+            self.user.save()
+            # a concurrent reader caches the row before the write commits
+            key = user_cache.key(User, "username", "cached")
+            cache.set(key, User(pk=self.user.pk, username="cached", full_name="Cached User"))
+            cache.set(user_cache.index_key(User, self.user.pk), [key])
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(User.objects.get_cached_by_username("cached").full_name, "Renamed User")
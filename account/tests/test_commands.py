@@ -2,10 +2,17 @@
 Test custom management command in account app
 """
 from io import StringIO
-from django.core.management import call_command
+from django.core.management import call_command, CommandError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
+from account.management.commands.backfill_new_users import split_pk_ranges
+from account.management.commands.project_user_migration import sample_windows
+from account.management.commands.populate_fake_user import populate_users
+from account.models import User as LegacyUser, Profile, Activity
+from address.models import Address
+from notification.models import Notification
+
 
 User = get_user_model()
 
@@ -44,3 +51,197 @@ class TestPopulateFakeDataCommand(TestCase):
         )
         # Check if the correct number of users were created
         self.assertEqual(User.objects.count(), total)
+
+    def test_populate_fake_user_bulk_in_batches(self):
+        """
+        Users are inserted in batches and every user gets a profile
+        """
+        stdout = StringIO()
+        call_command('populate_fake_user_bulk', 25, batch_size=10, stdout=stdout)
+        self.assertIn('Inserted 20/25 users', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(Profile.objects.count(), 25)
+        self.assertTrue(User.objects.first().check_password("Password@123"))
+
+    def test_populate_fake_user_password_hashing(self):
+        """
+        The hashing time is reported and pool mode salts every password
+        """
+        stdout = StringIO()
+        call_command('populate_fake_user_bulk', 4, password_hashing='pool', hash_workers=2, stdout=stdout)
+        self.assertIn('Password hashing (pool) took', stdout.getvalue())
+        passwords = list(User.objects.values_list("password", flat=True))
+        self.assertEqual(len(set(passwords)), 4)
+        self.assertTrue(User.objects.first().check_password("Password@123"))
+
+    def test_populate_fake_user_bulk_copy_loader(self):
+        """
+        The copy loader falls back to bulk_create and creates every profile
+        """
+        stdout = StringIO()
+        call_command('populate_fake_user_bulk', 15, batch_size=10, loader='copy', stdout=stdout)
+        self.assertEqual(User.objects.count(), 15)
+        self.assertEqual(Profile.objects.count(), 15)
+        self.assertTrue(User.objects.filter(joined_at__isnull=False, is_active=True).exists())
+
+    def test_populate_fake_user_workers(self):
+        """
+        Worker namespaces keep usernames disjoint and SQLite runs a single worker
+        """
+        populate_users(3, 1, namespace="w0-")
+        populate_users(3, 1, namespace="w1-")
+        self.assertEqual(User.objects.filter(username__contains="_w1-").count(), 3)
+        self.assertEqual(User.objects.count(), 6)
+
+        stdout = StringIO()
+        call_command('populate_fake_user', 2, workers=4, stdout=stdout)
+        self.assertIn('using 1 worker', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 8)
+
+
+class TestBackfillNewUsersCommand(TestCase):
+    """
+    Test backfilling new users from the legacy user table
+    """
+    def test_split_pk_ranges(self):
+        """
+        Ranges are contiguous, cover the whole primary key interval and have fixed bounds
+        """
+        self.assertEqual(split_pk_ranges(1, 10, 4), [(0, 4), (4, 8), (8, 12)])
+        self.assertEqual(split_pk_ranges(5, 5, 4), [(4, 8)])
+        # a larger max pk only adds ranges, the existing bounds stay the same
+        self.assertEqual(split_pk_ranges(1, 13, 4)[:3], split_pk_ranges(1, 10, 4))
+
+    def test_backfill_new_users(self):
+        """
+        Every legacy user is copied with a profile
+        """
+        LegacyUser.objects.bulk_create([
+            LegacyUser(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(5)
+        ])
+        stdout = StringIO()
+        call_command('backfill_new_users', workers=1, batch_size=2, range_size=2, stdout=stdout)
+        self.assertIn('Successfully copied 5 users', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Profile.objects.count(), 5)
+
+
+class TestVerifyUserMigrationCommand(TestCase):
+    """
+    Test comparing the legacy user table with the new user table
+    """
+    def setUp(self):
+        LegacyUser.objects.bulk_create([
+            LegacyUser(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(5)
+        ])
+        call_command('backfill_new_users', workers=1, stdout=StringIO())
+
+    def test_tables_match(self):
+        stdout = StringIO()
+        call_command('verify_user_migration', batch_size=2, stdout=stdout)
+        self.assertIn('all users match', stdout.getvalue())
+
+    def test_mismatch_is_reported(self):
+        User.objects.filter(username="legacy3").update(full_name="Changed")
+        User.objects.filter(username="legacy4").delete()
+        stdout = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_user_migration', batch_size=2, stdout=stdout)
+        self.assertIn('legacy3: full_name', stdout.getvalue())
+        self.assertIn('legacy4: username', stdout.getvalue())
+
+
+class TestProjectUserMigrationCommand(TestCase):
+    """
+    Test the dry run projection of the legacy user copy
+    """
+    def test_sample_is_rolled_back(self):
+        LegacyUser.objects.bulk_create([
+            LegacyUser(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(50)
+        ])
+        stdout = StringIO()
+        call_command('project_user_migration', sample=20, batch_size=5, budget=3600, stdout=stdout)
+        self.assertIn('Sampled 10 of 50 legacy users in 2 batches', stdout.getvalue())
+        verdict = stdout.getvalue().splitlines()[-1]
+        self.assertTrue(verdict.startswith('GO: projected'), verdict)
+        self.assertNotIn('NO-GO', stdout.getvalue())
+        self.assertNotIn('row locks', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(Profile.objects.count(), 0)
+
+    def test_sample_skips_copied_users_and_does_not_overlap(self):
+        LegacyUser.objects.bulk_create([
+            LegacyUser(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(50)
+        ])
+        User.objects.bulk_create([
+            User(
+                email=f"legacy{i}@example.com",
+                username=f"legacy{i}",
+                full_name=f"Legacy User {i}",
+                phone_number="+9779841234567",
+                date_of_birth="1990-01-01",
+            )
+            for i in range(25)
+        ])
+        stdout = StringIO()
+        call_command('project_user_migration', sample=100, batch_size=10, stdout=stdout)
+        self.assertIn('Sampled 24 of 25 legacy users in 3 batches', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 25)
+
+    def test_sample_windows_do_not_overlap(self):
+        self.assertEqual(sample_windows(10, 3, 5), [(0, 3), (3, 3), (6, 3)])
+        self.assertEqual(sample_windows(2, 3, 5), [(0, 1), (1, 1)])
+
+
+class TestGenerateDatasetCommand(TestCase):
+    """
+    Test generating a fake dataset for every app
+    """
+    def test_generate_dataset(self):
+        stdout = StringIO()
+        call_command(
+            'generate_dataset',
+            users=30,
+            batch_size=10,
+            seed=1,
+            addresses=(1, 2),
+            notifications=(2, 2),
+            activities=(0, 3),
+            read_ratio=0.5,
+            stdout=stdout,
+        )
+        self.assertIn('Successfully generated', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Notification.objects.count(), 60)
+        self.assertTrue(30 <= Address.objects.count() <= 60)
+        self.assertTrue(Activity.objects.count() <= 90)
+        self.assertTrue(Notification.objects.filter(is_read=False).exists())
@@ -0,0 +1,128 @@
+"""
+Test mirroring legacy user writes into the new user table
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from account.dual_write import cascade_delete_sql, mirror_legacy_users
+from account.models import User, NewUser, Profile, Activity
+from notification.models import Notification, UnreadCounter
+
+
+def create_legacy_user(username, **kwargs):
+    """
+    Create a legacy user with default attributes
+    """
+    kwargs.setdefault("email", f"{username}@example.com")
+    kwargs.setdefault("full_name", "Legacy User")
+    kwargs.setdefault("phone_number", "+9779841234567")
+    kwargs.setdefault("date_of_birth", "1990-01-01")
+    return User.objects.create(username=username, **kwargs)
+
+
+@override_settings(USER_DUAL_WRITE=True)
+class TestDualWrite(TestCase):
+    """
+    Test the signal based dual-write mode
+    """
+    def test_create_is_mirrored(self):
+        create_legacy_user("legacy")
+        new_user = NewUser.objects.get(username="legacy")
+        self.assertEqual(new_user.email, "legacy@example.com")
+        self.assertTrue(Profile.objects.filter(user=new_user).exists())
+
+    def test_update_and_rename_are_mirrored(self):
+        user = create_legacy_user("legacy")
+        user.full_name = "Changed Name"
+        user.username = "renamed"
+        user.save()
+        self.assertFalse(NewUser.objects.filter(username="legacy").exists())
+        self.assertEqual(NewUser.objects.get(username="renamed").full_name, "Changed Name")
+
+    def test_delete_is_mirrored(self):
+        user = create_legacy_user("legacy")
+        user.delete()
+        self.assertFalse(NewUser.objects.filter(username="legacy").exists())
+
+    def test_taken_email_does_not_fail_the_legacy_write(self):
+        create_legacy_user("first", email="shared@example.com")
+        with self.assertLogs("account.migrations", level="WARNING") as logs:
+            create_legacy_user("second", email="shared@example.com")
+        self.assertIn("second", logs.output[0])
+        self.assertTrue(User.objects.filter(username="second").exists())
+        self.assertFalse(NewUser.objects.filter(username="second").exists())
+
+    def test_rename_to_taken_username_does_not_fail_the_legacy_write(self):
+        user = create_legacy_user("legacy")
+        NewUser.objects.create(
+            username="taken", email="taken@example.com", full_name="Taken",
+            phone_number="+9779841234567", date_of_birth="1990-01-01",
+        )
+        user.username = "taken"
+        with self.assertLogs("account.migrations", level="WARNING"):
+            user.save()
+        self.assertEqual(User.objects.get(pk=user.pk).username, "taken")
+        self.assertEqual(NewUser.objects.get(username="taken").email, "taken@example.com")
+
+
+class TestMirrorLegacyUsers(TestCase):
+    """
+    Test the bulk mirroring hook
+    """
+    def test_email_conflicts_are_skipped_and_logged(self):
+        first = create_legacy_user("first", email="shared@example.com")
+        second = create_legacy_user("second", email="shared@example.com")
+        with self.assertLogs("account.migrations", level="WARNING"):
+            self.assertEqual(mirror_legacy_users([first.pk, second.pk]), 1)
+        self.assertEqual(list(NewUser.objects.values_list("username", flat=True)), ["first"])
+
+    def test_update_bumps_updated_at(self):
+        user = create_legacy_user("legacy")
+        mirror_legacy_users([user.pk])
+        updated_at = NewUser.objects.get(username="legacy").updated_at
+        User.objects.filter(pk=user.pk).update(full_name="Changed Name")
+        self.assertEqual(mirror_legacy_users([user.pk]), 1)
+        new_user = NewUser.objects.get(username="legacy")
+        self.assertEqual(new_user.full_name, "Changed Name")
+        self.assertGreater(new_user.updated_at, updated_at)
+
+    def test_cascade_delete_sql_removes_referencing_rows(self):
+        user = create_legacy_user("legacy")
+        mirror_legacy_users([user.pk])
+        new_user = NewUser.objects.get(username="legacy")
+        Activity.objects.create(user=new_user, activity_type="login", timestamp=timezone.now())
+        Notification.objects.create(user=new_user, message_body="Hello", timestamp=timezone.now())
+        statements = cascade_delete_sql(NewUser, "username = 'legacy'", connection.ops.quote_name)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        self.assertFalse(NewUser.objects.filter(username="legacy").exists())
+        for model in (Profile, Activity, Notification, UnreadCounter):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+
+class TestCutover(TestCase):
+    """
+    Test copying the remaining delta at cut-over
+    """
+    def test_cutover_copies_missing_users(self):
+        create_legacy_user("before")
+        with override_settings(USER_DUAL_WRITE=True):
+            create_legacy_user("during")
+        stdout = StringIO()
+        call_command("user_dual_write", "cutover", stdout=stdout)
+        self.assertIn("copied 1 remaining users", stdout.getvalue())
+        self.assertEqual(NewUser.objects.filter(username__in=["before", "during"]).count(), 2)
+        self.assertEqual(Profile.objects.count(), 2)
+
+    def test_cutover_skips_email_conflicts(self):
+        create_legacy_user("first", email="shared@example.com")
+        create_legacy_user("second", email="shared@example.com")
+        stdout = StringIO()
+        with self.assertLogs("account.migrations", level="WARNING"):
+            call_command("user_dual_write", "cutover", stdout=stdout)
+        self.assertIn("copied 1 remaining users", stdout.getvalue())
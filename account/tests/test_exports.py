@@ -0,0 +1,115 @@
+"""
+Test the incremental user data export and its restore
+"""
+import datetime
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import update_last_login
+from django.test import TestCase
+from django.utils import timezone
+
+from account.exports import export_chain, export_user_data, restore_user_data
+from account.models import NewUser, Profile
+
+
+def create_user(username):
+    """
+    Create a new user with default attributes
+    """
+    return NewUser.objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        full_name="Export User",
+        password="Password@123",
+        date_of_birth="1990-01-01",
+        phone_number="+9779841234567",
+    )
+
+
+class TestIncrementalExport(TestCase):
+    """
+    Test exporting changed rows and replaying the chain
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.kept = create_user("kept")
+        self.changed = create_user("changed")
+        self.deleted = create_user("deleted")
+
+    def test_increment_and_restore(self):
+        now = timezone.now()
+        _, full = export_user_data(self.root, chunk_size=2, now=now)
+        self.assertEqual(full["kind"], "full")
+        self.assertEqual(full["tables"]["account_newuser"]["rows"], 3)
+        self.assertEqual(len(full["tables"]["account_newuser"]["chunks"]), 2)
+
+        NewUser.objects.filter(pk=self.changed.pk).update(full_name="Changed Name", updated_at=now + datetime.timedelta(seconds=1))
+        self.deleted.delete()
+        _, increment = export_user_data(
+            self.root, chunk_size=2, now=now + datetime.timedelta(seconds=2), lag=datetime.timedelta(0)
+        )
+        self.assertEqual(increment["kind"], "incremental")
+        self.assertEqual(increment["tables"]["account_newuser"]["rows"], 1)
+        self.assertEqual(increment["live_ids"]["rows"], 2)
+        self.assertEqual(len(export_chain(self.root)), 2)
+
+        NewUser.objects.all().delete()
+        restored = restore_user_data(self.root)
+
+        self.assertEqual([rows for _, rows in restored], [6, 1])
+        self.assertEqual(sorted(NewUser.objects.values_list("username", flat=True)), ["changed", "kept"])
+        self.assertEqual(NewUser.objects.get(username="changed").full_name, "Changed Name")
+        self.assertTrue(NewUser.objects.get(username="kept").check_password("Password@123"))
+        self.assertEqual(Profile.objects.count(), 2)
+
+    def test_increment_overlaps_the_previous_export(self):
+        now = timezone.now()
+        NewUser.objects.update(updated_at=now - datetime.timedelta(minutes=10))
+        Profile.objects.update(updated_at=now - datetime.timedelta(minutes=10))
+        export_user_data(self.root, now=now)
+
+        # committed after the full export, but stamped before its high-water mark
+        NewUser.objects.filter(pk=self.changed.pk).update(
+            full_name="Late Commit", updated_at=now - datetime.timedelta(seconds=1)
+        )
+        _, increment = export_user_data(self.root, now=now + datetime.timedelta(minutes=1))
+        self.assertEqual(increment["tables"]["account_newuser"]["rows"], 1)
+
+        restore_user_data(self.root)
+        self.assertEqual(NewUser.objects.get(pk=self.changed.pk).full_name, "Late Commit")
+
+    def test_partial_save_bumps_updated_at(self):
+        updated_at = timezone.now() - datetime.timedelta(days=1)
+        NewUser.objects.filter(pk=self.kept.pk).update(updated_at=updated_at)
+        user = NewUser.objects.get(pk=self.kept.pk)
+        update_last_login(None, user)
+        self.assertGreater(NewUser.objects.get(pk=self.kept.pk).updated_at, updated_at)
+
+    def test_restore_requires_full_export(self):
+        os.makedirs(os.path.join(self.root, "empty"))
+        with self.assertRaises(ValueError):
+            restore_user_data(self.root)
+
+    def test_restore_keeps_exported_timestamps(self):
+        joined_at = timezone.now() - datetime.timedelta(days=400)
+        updated_at = joined_at + datetime.timedelta(days=1)
+        NewUser.objects.filter(pk=self.kept.pk).update(joined_at=joined_at, updated_at=updated_at)
+        export_user_data(self.root)
+
+        # one restored row is inserted again, the other updates an existing row
+        NewUser.objects.filter(pk=self.kept.pk).delete()
+        NewUser.objects.filter(pk=self.changed.pk).update(joined_at=timezone.now(), full_name="Local")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(NewUser.objects.get_cached_by_username("changed").full_name, "Local")
+        restore_user_data(self.root)
+
+        kept = NewUser.objects.get(pk=self.kept.pk)
+        self.assertEqual((kept.joined_at, kept.updated_at), (joined_at, updated_at))
+        changed = NewUser.objects.get(pk=self.changed.pk)
+        self.assertEqual(changed.joined_at, self.changed.joined_at)
+        self.assertEqual(changed.full_name, "Export User")
+        # the restore drops the cached users it overwrote
+        self.assertEqual(NewUser.objects.get_cached_by_username("changed").full_name, "Export User")
@@ -1,6 +1,10 @@
 """
 Tests for Custom User Model
 """
+import datetime
+import unittest
+
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -99,4 +103,101 @@ class ModelTests(TestCase):
     def test_auto_profile_created(self):
         profile = Profile.objects.get(user=self.user)
         self.assertIsInstance(profile, Profile)
-        self.assertEqual(self.user.username, profile.user.username)
\ No newline at end of file
+        self.assertEqual(self.user.username, profile.user.username)
+
+
+class ProfileProvisionTests(TestCase):
+    """
+    Test creating missing profiles for bulk created users
+    """
+
+    def setUp(self):
+        User.objects.bulk_create([
+            User(
+                email=f"bulk{i}@example.com",
+                username=f"bulk{i}",
+                full_name="Bulk User",
+                date_of_birth="1990-01-01",
+                phone_number="+9779841234567",
+            )
+            for i in range(4)
+        ])
+
+    def test_provision_by_ids(self):
+        user_ids = list(User.objects.values_list("pk", flat=True))
+        self.assertEqual(Profile.objects.provision(user_ids[:2]), 2)
+        self.assertEqual(Profile.objects.provision(user_ids), 2)
+        self.assertEqual(Profile.objects.count(), 4)
+
+    def test_provision_by_queryset(self):
+        self.assertEqual(Profile.objects.provision(User.objects.filter(username__in=["bulk1", "bulk2"])), 2)
+        self.assertEqual(Profile.objects.provision(User.objects.all()), 2)
+        self.assertEqual(Profile.objects.provision(User.objects.all()), 0)
+        self.assertEqual(Profile.objects.provision([]), 0)
+
+    def test_provision_drops_cached_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(hasattr(User.objects.get_cached_by_username("bulk0"), "profile"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.provision(User.objects.filter(username="bulk0"))
+        self.assertTrue(hasattr(User.objects.get_cached_by_username("bulk0"), "profile"))
+
+
+class BirthdayQueryTests(TestCase):
+    """
+    Test finding the users whose birthday is on a day
+    """
+
+    def setUp(self):
+        User.objects.bulk_create([
+            User(
+                email=f"{username}@example.com",
+                username=username,
+                full_name="Birthday User",
+                date_of_birth=date_of_birth,
+                phone_number="+9779841234567",
+            )
+            for username, date_of_birth in [
+                ("march", datetime.date(1990, 3, 15)),
+                ("leap", datetime.date(1992, 2, 29)),
+                ("feb28", datetime.date(1985, 2, 28)),
+                ("mar1", datetime.date(1980, 3, 1)),
+            ]
+        ])
+
+    def usernames(self, day, **kwargs):
+        return sorted(User.objects.birthdays_on(day, **kwargs).values_list("username", flat=True))
+
+    def test_birthdays_on_day(self):
+        self.assertEqual(self.usernames(datetime.date(2023, 3, 15)), ["march"])
+        self.assertEqual(self.usernames(datetime.date(2023, 3, 16)), [])
+
+    def test_leap_day_birthdays(self):
+        self.assertEqual(self.usernames(datetime.date(2024, 2, 29)), ["leap"])
+        self.assertEqual(self.usernames(datetime.date(2024, 2, 28)), ["feb28"])
+        self.assertEqual(self.usernames(datetime.date(2023, 2, 28)), ["feb28", "leap"])
+        self.assertEqual(self.usernames(datetime.date(2023, 3, 1), leap_day="mar1"), ["leap", "mar1"])
+        self.assertEqual(self.usernames(datetime.date(2023, 3, 1)), ["mar1"])
+
+    def test_batches(self):
+        User.objects.bulk_create([
+            User(
+                email=f"batch{index}@example.com",
+                username=f"batch{index}",
+                full_name="Birthday User",
+                date_of_birth=datetime.date(1990 + index, 3, 15),
+                phone_number="+9779841234567",
+            )
+            for index in range(4)
+        ])
+        batches = list(User.objects.iter_birthday_batches(datetime.date(2023, 3, 15), batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        pks = [user.pk for batch in batches for user in batch]
+        self.assertEqual(pks, sorted(pks))
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "SQLite passes the extracted field as a parameter and cannot match the index expression")
+    def test_query_uses_birthday_index(self):
+        users = User.objects.birthdays_on(datetime.date(2023, 3, 15))
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        self.assertIn("account_newuser_birthday_idx", users.explain())
@@ -0,0 +1,92 @@
+"""
+Test restoring an export with deferred indexes
+"""
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.core.management import call_command, CommandError
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from account.models import NewUser, Profile
+from account import restore
+from account.restore import deferred_schema
+from account.table_export import export_models, export_tables
+from notification.models import Notification
+
+
+class TestRestoreBackupCommand(TestCase):
+    """
+    Test restoring the tables written by export_tables
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        NewUser.objects.bulk_create([
+            NewUser(
+                email=f"restore{index}@example.com",
+                username=f"restore{index}",
+                full_name="Restore User",
+                password="unusable",
+                date_of_birth="1990-01-01",
+                phone_number="+9779841234567",
+            )
+            for index in range(30)
+        ])
+        Profile.objects.provision(NewUser.objects.all())
+        Notification.objects.bulk_create([
+            Notification(user=user, message_body="Hello", timestamp=timezone.now())
+            for user in NewUser.objects.all()
+        ])
+        export_tables(self.directory, models=export_models(), max_chunk_bytes=1000)
+
+    def test_restore_replaces_rows_and_rebuilds_indexes(self):
+        users = {user.pk: (user.username, user.joined_at) for user in NewUser.objects.all()}
+        indexes = sorted(deferred_schema(["account_newuser"])["indexes"])
+        self.assertTrue(indexes)
+        NewUser.objects.filter(username="restore0").update(full_name="Changed Name")
+        out = StringIO()
+
+        call_command("restore_backup", self.directory, "--replace", "--workers", "1", stdout=out)
+
+        self.assertEqual({user.pk: (user.username, user.joined_at) for user in NewUser.objects.all()}, users)
+        self.assertEqual(NewUser.objects.get(username="restore0").full_name, "Restore User")
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Notification.objects.count(), 30)
+        self.assertEqual(sorted(deferred_schema(["account_newuser"])["indexes"]), indexes)
+        self.assertIn("load:", out.getvalue())
+        self.assertIn("build indexes:", out.getvalue())
+
+    def test_restore_requires_empty_tables(self):
+        with self.assertRaises(CommandError):
+            call_command("restore_backup", self.directory, stdout=StringIO())
+
+    def test_replace_keeps_referencing_tables_outside_the_export(self):
+        user = NewUser.objects.first()
+        LogEntry.objects.create(user=user, action_flag=ADDITION, object_repr="restore0")
+        with self.assertRaisesMessage(CommandError, "django_admin_log"):
+            call_command("restore_backup", self.directory, "--replace", stdout=StringIO())
+        self.assertEqual(LogEntry.objects.count(), 1)
+        self.assertEqual(NewUser.objects.count(), 30)
+
+    def test_failed_index_build_prints_missing_schema(self):
+        indexes = deferred_schema(["account_newuser"])["indexes"]
+        self.assertTrue(indexes)
+        execute_statement = "account.management.commands.restore_backup.execute_statement"
+        original = restore.execute_statement
+
+        def fail_on_create(sql, using="default"):
+            if sql in indexes:
+                raise DatabaseError("index build failed")
+            return original(sql, using)
+
+        err = StringIO()
+        with mock.patch(execute_statement, side_effect=fail_on_create), self.assertRaises(DatabaseError):
+            call_command("restore_backup", self.directory, "--replace", "--workers", "1", stdout=StringIO(), stderr=err)
+        self.assertIn("the missing indexes and constraints are", err.getvalue())
+        for sql in indexes:
+            self.assertIn(f"{sql};", err.getvalue())
@@ -0,0 +1,36 @@
+"""
+Test the fake user data generator
+"""
+import datetime
+
+import phonenumbers
+from django.test import SimpleTestCase
+
+from account.seeding import UserDataGenerator, base36
+
+
+class TestUserDataGenerator(SimpleTestCase):
+    """
+    Test generating fake users in batches
+    """
+    def test_base36(self):
+        self.assertEqual(base36(0), "0")
+        self.assertEqual(base36(35), "z")
+        self.assertEqual(base36(36), "10")
+
+    def test_same_seed_same_rows(self):
+        today = datetime.date(2024, 1, 1)
+        first = UserDataGenerator(seed=7, today=today).rows(50)
+        second = UserDataGenerator(seed=7, today=today).rows(50)
+        self.assertEqual(first, second)
+
+    def test_rows_are_unique_and_valid(self):
+        generator = UserDataGenerator(seed=1, pool_size=20)
+        rows = [row for batch in generator.batches(2500, 1000) for row in batch]
+        self.assertEqual(len(rows), 2500)
+        self.assertEqual(len({row["username"] for row in rows}), 2500)
+        self.assertEqual(len({row["email"] for row in rows}), 2500)
+        self.assertEqual(generator.sequence, 2501)
+        for row in rows[:100]:
+            self.assertTrue(phonenumbers.is_valid_number(phonenumbers.parse(row["phone_number"])))
+            self.assertLessEqual(row["date_of_birth"], datetime.date.today() - datetime.timedelta(days=18 * 365))
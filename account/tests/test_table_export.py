@@ -0,0 +1,69 @@
+"""
+Test the streaming table exporter
+"""
+import csv
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from account.models import NewUser, Profile
+from account.table_export import MANIFEST_NAME, export_tables, verify_export
+
+
+class TestTableExport(TestCase):
+    """
+    Test exporting tables into checksummed chunks
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        NewUser.objects.bulk_create([
+            NewUser(
+                email=f"export{index}@example.com",
+                username=f"export{index}",
+                full_name="Export User",
+                password="unusable",
+                date_of_birth="1990-01-01",
+                phone_number="+9779841234567",
+            )
+            for index in range(20)
+        ])
+        Profile.objects.provision(NewUser.objects.all())
+
+    def test_chunks_and_manifest(self):
+        manifest = export_tables(self.directory, models=[NewUser, Profile], max_chunk_bytes=1000)
+        users = manifest["tables"]["account_newuser"]
+        self.assertEqual(users["rows"], 20)
+        self.assertGreater(len(users["chunks"]), 1)
+        self.assertEqual(sum(chunk["rows"] for chunk in users["chunks"]), 20)
+        self.assertEqual(manifest["tables"]["account_profile"]["rows"], 20)
+
+        rows = []
+        for chunk in users["chunks"]:
+            with gzip.open(os.path.join(self.directory, chunk["file"]), "rt") as file:
+                rows.extend(csv.reader(file))
+        self.assertEqual([row[users["columns"].index("username")] for row in rows], [f"export{index}" for index in range(20)])
+        self.assertEqual(rows[0][users["columns"].index("last_login")], "\\N")
+        self.assertEqual(rows[0][users["columns"].index("is_active")], "t")
+        self.assertEqual(verify_export(self.directory), [])
+
+    def test_verify_detects_corruption(self):
+        manifest = export_tables(self.directory, models=[NewUser], max_chunk_bytes=1000)
+        chunk = manifest["tables"]["account_newuser"]["chunks"][0]["file"]
+        with open(os.path.join(self.directory, chunk), "ab") as file:
+            file.write(b"garbage")
+        self.assertEqual(verify_export(self.directory), [chunk])
+
+    def test_command(self):
+        call_command("export_tables", "--output-dir", self.directory, stdout=StringIO())
+        [export] = os.listdir(self.directory)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, export, MANIFEST_NAME)))
+        call_command("export_tables", "--verify", os.path.join(self.directory, export), stdout=StringIO())
+        os.remove(os.path.join(self.directory, export, "account_newuser-00000.csv.gz"))
+        with self.assertRaises(CommandError):
+            call_command("export_tables", "--verify", os.path.join(self.directory, export), stdout=StringIO())
@@ -0,0 +1,159 @@
+"""
+This module compares the legacy user table with the new user table after the data migration.
+
+Rows are matched by username and compared range by range: a hash of every
+primary key range is computed on both sides and only ranges whose hashes
+differ are compared row by row.
+"""
+import hashlib
+
+from django.db import connections
+
+from account.backfill import iter_old_user_pk_batches
+
+# columns that must be identical on both sides. phone_number is left out
+# because the ORM copy normalizes it to E.164
+VERIFY_FIELDS = [
+    "username",
+    "email",
+    "full_name",
+    "password",
+    "date_of_birth",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+]
+
+
+def range_hashes_sql(start_pk, end_pk, old_user, new_user, using="default"):
+    """
+    Hash a primary key range on both sides inside PostgreSQL.
+
+    Args:
+        start_pk (int): Exclusive lower bound of the range.
+        end_pk (int): Inclusive upper bound of the range.
+        old_user (Model): The legacy user model.
+        new_user (Model): The new user model.
+        using (str, optional): The database alias.
+
+    Returns:
+        tuple: (legacy hash, new hash)
+    """
+    old_columns = ", ".join(f"u.{field}" for field in VERIFY_FIELDS)
+    new_columns = ", ".join(f"n.{field}" for field in VERIFY_FIELDS)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT md5(string_agg(concat_ws('|', {old_columns}), E'\\n' ORDER BY u.id)), "
+            f"md5(string_agg(concat_ws('|', {new_columns}), E'\\n' ORDER BY u.id)) "
+            f"FROM {old_user._meta.db_table} u "
+            f"LEFT JOIN {new_user._meta.db_table} n ON n.username = u.username "
+            "WHERE u.id > %s AND u.id <= %s",
+            [start_pk, end_pk],
+        )
+        return cursor.fetchone()
+
+
+def fetch_range_rows(start_pk, end_pk, old_user, new_user, using="default"):
+    """
+    Fetch the rows of a primary key range from both sides.
+
+    Args:
+        start_pk (int): Exclusive lower bound of the range.
+        end_pk (int): Inclusive upper bound of the range.
+        old_user (Model): The legacy user model.
+        new_user (Model): The new user model.
+        using (str, optional): The database alias.
+
+    Returns:
+        tuple: (legacy rows in primary key order, dict of new rows keyed by username)
+    """
+    old_rows = list(
+        old_user.objects.using(using)
+        .filter(pk__gt=start_pk, pk__lte=end_pk)
+        .order_by("pk")
+        .values_list(*VERIFY_FIELDS)
+    )
+    new_rows = {
+        row[0]: row
+        for row in new_user.objects.using(using)
+        .filter(username__in=[row[0] for row in old_rows])
+        .values_list(*VERIFY_FIELDS)
+    }
+    return old_rows, new_rows
+
+
+def range_hashes_python(old_rows, new_rows):
+    """
+    Hash the rows of a primary key range on both sides in Python.
+
+    Args:
+        old_rows (list): Legacy rows as returned by fetch_range_rows.
+        new_rows (dict): New rows as returned by fetch_range_rows.
+
+    Returns:
+        tuple: (legacy hash, new hash)
+    """
+    old_hash = hashlib.md5()
+    new_hash = hashlib.md5()
+    for row in old_rows:
+        old_hash.update(repr(row).encode())
+        new_hash.update(repr(new_rows.get(row[0])).encode())
+    return old_hash.hexdigest(), new_hash.hexdigest()
+
+
+def diff_rows(old_rows, new_rows):
+    """
+    Compare the rows of a primary key range one by one.
+
+    Args:
+        old_rows (list): Legacy rows as returned by fetch_range_rows.
+        new_rows (dict): New rows as returned by fetch_range_rows.
+
+    Returns:
+        list: (username, list of differing fields) tuples. A missing new
+        row is reported with every field.
+    """
+    mismatches = []
+    for row in old_rows:
+        new_row = new_rows.get(row[0])
+        if new_row is None:
+            mismatches.append((row[0], list(VERIFY_FIELDS)))
+            continue
+        fields = [field for field, old, new in zip(VERIFY_FIELDS, row, new_row) if old != new]
+        if fields:
+            mismatches.append((row[0], fields))
+    return mismatches
+
+
+def verify_users(old_user, new_user, batch_size=10000, using="default"):
+    """
+    Compare the legacy and new user tables range by range.
+
+    Only one primary key range is held in memory at a time, and only when
+    its hashes differ.
+
+    Args:
+        old_user (Model): The legacy user model.
+        new_user (Model): The new user model.
+        batch_size (int, optional): Number of legacy rows per range.
+        using (str, optional): The database alias.
+
+    Yields:
+        tuple: (start_pk, end_pk, mismatches) for every range, mismatches
+        being the output of diff_rows or an empty list.
+    """
+    in_database = connections[using].vendor == "postgresql"
+    for start_pk, end_pk, _ in iter_old_user_pk_batches(old_user, batch_size, using=using):
+        if in_database:
+            old_hash, new_hash = range_hashes_sql(start_pk, end_pk, old_user, new_user, using)
+            if old_hash == new_hash:
+                yield start_pk, end_pk, []
+                continue
+            old_rows, new_rows = fetch_range_rows(start_pk, end_pk, old_user, new_user, using)
+        else:
+            old_rows, new_rows = fetch_range_rows(start_pk, end_pk, old_user, new_user, using)
+            old_hash, new_hash = range_hashes_python(old_rows, new_rows)
+            if old_hash == new_hash:
+                yield start_pk, end_pk, []
+                continue
+        yield start_pk, end_pk, diff_rows(old_rows, new_rows)
@@ -0,0 +1,208 @@
+"""
+This module sends one notification to many users with set-based inserts.
+
+A fan-out walks the target users in primary key ranges and inserts the
+notifications of every range with a single INSERT ... SELECT statement.
+Notifications of a campaign are unique per user, so a retried or resumed
+fan-out only inserts the notifications that are still missing.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from django.contrib.auth import get_user_model
+
+from notification.manager import adjust_unread_counts, refresh_unread_counts
+from notification.models import Notification
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# named user segments a fan-out can target
+SEGMENTS = {
+    "all": lambda: User.objects.all(),
+    "active": lambda: User.objects.filter(is_active=True),
+    "staff": lambda: User.objects.filter(is_staff=True),
+    "birthday": lambda: User.objects.birthdays_on(),
+}
+
+
+# seconds the progress of a campaign is kept after its last update
+PROGRESS_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def progress_key(campaign_id):
+    """
+    Return the cache key holding the progress of a campaign.
+    """
+    return f"notification:fanout:{campaign_id}"
+
+
+def get_progress(campaign_id):
+    """
+    Return the last reported progress of a campaign, or None.
+
+    Args:
+        campaign_id (str): The campaign id.
+
+    Returns:
+        dict: Users processed, notifications inserted, batches and whether the fan-out is done.
+    """
+    return cache.get(progress_key(campaign_id))
+
+
+def iter_pk_ranges(users, batch_size):
+    """
+    Yield (start, end) primary key ranges holding up to batch_size users each.
+
+    The ranges are found with keyset pagination, every query reads the next
+    batch_size primary keys after the end of the previous range from the index.
+
+    Args:
+        users (QuerySet): The target users.
+        batch_size (int): Number of users per range.
+
+    Yields:
+        tuple: Exclusive start and inclusive end of the range.
+    """
+    pks = users.order_by("pk").values_list("pk", flat=True)
+    start = 0
+    while True:
+        batch = list(pks.filter(pk__gt=start)[:batch_size])
+        if not batch:
+            return
+        yield start, batch[-1]
+        if len(batch) < batch_size:
+            return
+        start = batch[-1]
+
+
+def insert_range(users, message, campaign_id, timestamp, start, end, using):
+    """
+    Insert the notifications of the users in one primary key range.
+
+    Args:
+        users (QuerySet): The target users.
+        message (str): The notification message.
+        campaign_id (str): The campaign id.
+        timestamp (datetime): The notification timestamp.
+        start (int): Exclusive lower bound of the range.
+        end (int): Inclusive upper bound of the range.
+        using (str): The database alias.
+
+    Returns:
+        tuple: (users in the range, notifications inserted)
+    """
+    connection = connections[using]
+    targets = users.filter(pk__gt=start, pk__lte=end)
+    subquery, params = targets.values("pk").query.get_compiler(using).as_sql()
+    table = Notification._meta.db_table
+    now = connection.ops.adapt_datetimefield_value(timestamp)
+    returning = connection.features.can_return_rows_from_bulk_insert
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (message_body, user_id, is_read, timestamp, campaign_id) "
+            f"SELECT %s, u.{User._meta.pk.column}, %s, %s, %s FROM ({subquery}) u "
+            # sqlite needs a WHERE clause to tell ON CONFLICT apart from a join constraint
+            "WHERE true ON CONFLICT DO NOTHING" + (" RETURNING user_id" if returning else ""),
+            (message, False, now, campaign_id, *params),
+        )
+        if returning:
+            user_ids = [user_id for user_id, in cursor.fetchall()]
+            inserted = len(user_ids)
+        else:
+            inserted = cursor.rowcount
+    if returning:
+        # every inserted notification is unread, skipped users keep their count
+        adjust_unread_counts(dict.fromkeys(user_ids, 1), using)
+    else:
+        refresh_unread_counts(targets, using)
+    return targets.count(), inserted
+
+
+def fan_out(message, campaign_id, users=None, segment=None, batch_size=5000, timestamp=None,
+            using=None, report=None):
+    """
+    Send a notification to every target user, once per campaign.
+
+    Each range of users is inserted in its own transaction, so an
+    interrupted fan-out keeps the batches already sent and a rerun with the
+    same campaign id completes it without duplicates.
+
+    Args:
+        message (str): The notification message.
+        campaign_id (str): Identifies the fan-out, notifications are unique per campaign and user.
+        users (QuerySet, optional): The target users.
+        segment (str, optional): Name of a segment in SEGMENTS, used when users is not given.
+        batch_size (int, optional): Number of users per statement.
+        timestamp (datetime, optional): The notification timestamp, defaults to now.
+        using (str, optional): The database alias.
+        report (callable, optional): Called with the progress dict after every batch.
+
+    Returns:
+        dict: The final progress.
+    """
+    if users is None:
+        users = SEGMENTS[segment or "all"]()
+    using = using or router.db_for_write(Notification)
+    users = users.using(using)
+    timestamp = timestamp or timezone.now()
+    started = time.perf_counter()
+    progress = {
+        "campaign_id": campaign_id, "users": 0, "inserted": 0, "batches": 0, "seconds": 0, "done": False, "error": None,
+    }
+    for start, end in iter_pk_ranges(users, batch_size):
+        with transaction.atomic(using=using):
+            targeted, inserted = insert_range(users, message, campaign_id, timestamp, start, end, using)
+        progress["users"] += targeted
+        progress["inserted"] += inserted
+        progress["batches"] += 1
+        progress["seconds"] = round(time.perf_counter() - started, 3)
+        cache.set(progress_key(campaign_id), progress, PROGRESS_TIMEOUT)
+        if report:
+            report(dict(progress))
+    progress["done"] = True
+    progress["seconds"] = round(time.perf_counter() - started, 3)
+    cache.set(progress_key(campaign_id), progress, PROGRESS_TIMEOUT)
+    return progress
+
+
+def fan_out_in_background(message, campaign_id, **kwargs):
+    """
+    Run a fan-out in a daemon thread and return at once.
+
+    The progress can be followed with get_progress(campaign_id). A failed
+    fan-out is logged and reported as done with its error, a rerun with the
+    same campaign id sends the rest.
+
+    Args:
+        message (str): The notification message.
+        campaign_id (str): The campaign id.
+        kwargs: Passed on to fan_out.
+
+    Returns:
+        Thread: The started thread.
+    """
+    def run():
+        try:
+            fan_out(message, campaign_id, **kwargs)
+        except Exception as error:
+            logger.exception("Fan-out of campaign %s failed", campaign_id)
+            # pollers stop at done, error tells them the fan-out did not complete
+            progress = get_progress(campaign_id) or {
+                "campaign_id": campaign_id, "users": 0, "inserted": 0, "batches": 0, "seconds": 0,
+            }
+            progress.update(done=True, error=str(error) or error.__class__.__name__)
+            cache.set(progress_key(campaign_id), progress, PROGRESS_TIMEOUT)
+        finally:
+            # the thread opened its own connections
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name=f"fanout-{campaign_id}", daemon=True)
+    thread.start()
+    return thread
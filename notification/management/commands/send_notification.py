@@ -0,0 +1,70 @@
+"""
+    This module is management command for sending a notification to many users
+"""
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from notification.fanout import SEGMENTS, fan_out
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to send one notification to a segment of users
+
+    Notifications are inserted in batches with INSERT ... SELECT. Rerunning
+    the command with the same campaign id only sends the missing
+    notifications, so an interrupted fan-out can simply be retried.
+
+    Usuage:
+        python manage.py send_notification <message> [--campaign ID] [--segment NAME] [--batch-size N]
+
+    Args:
+        message (str): the notification message
+
+    Example:
+        To announce maintenance to every active user, run:
+            python manage.py send_notification "Maintenance tonight" --campaign maintenance-1 --segment active
+    """
+    help = "Send a notification to a segment of users in batches, once per campaign"
+
+    def add_arguments(self, parser):
+        """
+        Define command-line arguments for the management command.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument("message", help="the notification message")
+        parser.add_argument("--campaign", default=None, help="campaign id, a random one is used by default")
+        parser.add_argument("--segment", choices=list(SEGMENTS), default="all", help="users to notify")
+        parser.add_argument("--batch-size", type=int, default=5000, help="number of users per statement")
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the execution logic of the management commmand
+
+        Args:
+            args: Additional Arguments.
+            kwargs: Additional keyword arguments
+        """
+        campaign_id = kwargs["campaign"] or uuid.uuid4().hex
+
+        def report(progress):
+            self.stdout.write(
+                f"batch {progress['batches']}: {progress['users']} users, "
+                f"{progress['inserted']} notifications in {progress['seconds']:.1f}s"
+            )
+
+        progress = fan_out(
+            kwargs["message"],
+            campaign_id,
+            segment=kwargs["segment"],
+            batch_size=kwargs["batch_size"],
+            report=report,
+        )
+        skipped = progress["users"] - progress["inserted"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Campaign {campaign_id}: sent {progress['inserted']} notifications to {progress['users']} users "
+            f"({skipped} already sent) in {progress['seconds']:.2f}s"
+        ))
@@ -0,0 +1,197 @@
+"""
+This module contains the queryset of Notification and the unread counters.
+
+Every user has one UnreadCounter row holding the number of unread
+notifications, so badges are read with a primary key lookup instead of a
+count over the notification table. Single saves and deletes keep the
+counters in sync in Notification itself, the bulk operations in the queryset.
+"""
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db import connections, models, router, transaction
+from django.db.models import F, QuerySet
+
+# number of users per counter statement
+COUNTER_BATCH_SIZE = 1000
+
+
+def counter_model():
+    """
+    Return the UnreadCounter model, which is defined after this module is imported.
+    """
+    return apps.get_model("notification", "UnreadCounter")
+
+
+def adjust_unread_counts(deltas, using="default"):
+    """
+    Add per user deltas to the unread counters.
+
+    Counters are created for users whose count goes up. Users whose count
+    goes down always have a counter, and are not created again while they
+    are being deleted.
+
+    Args:
+        deltas (dict): Change of the unread count keyed by user id.
+        using (str, optional): The database alias.
+    """
+    UnreadCounter = counter_model()
+    increased = [user_id for user_id, delta in deltas.items() if delta > 0]
+    UnreadCounter.objects.using(using).bulk_create(
+        [UnreadCounter(user_id=user_id) for user_id in increased],
+        ignore_conflicts=True,
+        batch_size=COUNTER_BATCH_SIZE,
+    )
+    # one statement per distinct delta, a fan-out adds 1 to every counter
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        for index in range(0, len(user_ids), COUNTER_BATCH_SIZE):
+            UnreadCounter.objects.using(using).filter(
+                user_id__in=user_ids[index:index + COUNTER_BATCH_SIZE]
+            ).update(unread=F("unread") + delta)
+
+
+def refresh_unread_counts(users, using="default"):
+    """
+    Recount the unread notifications of a set of users with two set-based statements.
+
+    Used after notifications were written without the ORM, for example by
+    INSERT ... SELECT or COPY. The counts are served by the unread index.
+
+    Args:
+        users (QuerySet or iterable): A user queryset or user primary keys.
+        using (str, optional): The database alias.
+    """
+    connection = connections[using]
+    if isinstance(users, QuerySet):
+        subquery, params = users.values("pk").query.get_compiler(using).as_sql()
+    else:
+        user_ids = list(users)
+        if not user_ids:
+            return
+        subquery = ", ".join(["%s"] * len(user_ids))
+        params = tuple(user_ids)
+
+    UnreadCounter = counter_model()
+    Notification = apps.get_model("notification", "Notification")
+    counter_table = UnreadCounter._meta.db_table
+    user_table = UnreadCounter._meta.get_field("user").related_model._meta.db_table
+    notification_table = Notification._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {counter_table} (user_id, unread) "
+            f"SELECT u.id, 0 FROM {user_table} u WHERE u.id IN ({subquery}) "
+            "ON CONFLICT DO NOTHING",
+            params,
+        )
+        cursor.execute(
+            f"UPDATE {counter_table} SET unread = ("
+            f"SELECT COUNT(*) FROM {notification_table} n "
+            f"WHERE n.user_id = {counter_table}.user_id AND n.is_read = %s"
+            f") WHERE user_id IN ({subquery})",
+            (False, *params),
+        )
+
+
+class NotificationQuerySet(models.QuerySet):
+    """
+    Custom queryset for Notification Model that keeps the unread counters in sync
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create notifications and add the unread ones to the counters.
+        """
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts"):
+            # the skipped or updated rows are unknown, so count again
+            refresh_unread_counts({obj.user_id for obj in objs}, self.db)
+        else:
+            adjust_unread_counts(Counter(obj.user_id for obj in objs if not obj.is_read), self.db)
+        return objs
+
+    def update(self, **kwargs):
+        """
+        Update notifications and apply read state changes to the counters.
+        """
+        moves = "user" in kwargs or "user_id" in kwargs
+        if "is_read" not in kwargs and not moves:
+            return super().update(**kwargs)
+        is_read = kwargs.get("is_read")
+        with transaction.atomic(using=self.db):
+            if moves or not isinstance(is_read, bool):
+                # an expression may flip rows either way and moved rows change
+                # two counters, so the old and the new users are counted again
+                changing = dict(self.select_for_update().values_list("pk", "user_id"))
+                rows = super().update(**kwargs)
+                users = set(changing.values())
+                users.update(
+                    self.model._base_manager.using(self.db).filter(pk__in=list(changing)).values_list("user_id", flat=True)
+                )
+                refresh_unread_counts(users, self.db)
+                return rows
+            # lock the rows that change, so concurrent updates cannot count them twice
+            changing = Counter(self.filter(is_read=not is_read).select_for_update().values_list("user_id", flat=True))
+            sign = -1 if is_read else 1
+            deltas = {user_id: sign * rows for user_id, rows in changing.items()}
+            rows = super().update(**kwargs)
+            adjust_unread_counts(deltas, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        """
+        Delete notifications and remove the unread ones from the counters.
+        """
+        with transaction.atomic(using=self.db):
+            unread = Counter(self.filter(is_read=False).select_for_update().values_list("user_id", flat=True))
+            deltas = {user_id: -rows for user_id, rows in unread.items()}
+            result = super().delete()
+            adjust_unread_counts(deltas, self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def unread_count(self, user):
+        """
+        Return the number of unread notifications of a user from its counter.
+
+        Args:
+            user (User or int): The user or its primary key.
+
+        Returns:
+            int: The unread count.
+        """
+        user_id = getattr(user, "pk", user)
+        using = self.db or router.db_for_read(counter_model())
+        unread = counter_model().objects.using(using).filter(user_id=user_id).values_list("unread", flat=True).first()
+        return unread or 0
+
+    def mark_all_read(self, user, batch_size=1000):
+        """
+        Mark every unread notification of a user as read in bounded batches.
+
+        Each batch is committed on its own, so no statement locks more than
+        batch_size notification rows or holds its locks for long.
+
+        Args:
+            user (User or int): The user or its primary key.
+            batch_size (int, optional): Number of notifications per batch.
+
+        Returns:
+            int: Number of notifications marked as read.
+        """
+        user_id = getattr(user, "pk", user)
+        unread = self.filter(user_id=user_id, is_read=False).order_by("pk").values_list("pk", flat=True)
+        total = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                pks = list(unread[:batch_size])
+                if not pks:
+                    return total
+                total += self.filter(pk__in=pks, is_read=False).update(is_read=True)
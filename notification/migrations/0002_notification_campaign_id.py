@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='campaign_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('campaign_id__isnull', False)), fields=('campaign_id', 'user'), name='notification_unique_campaign_user'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_unread_notifications(apps, schema_editor):
+    """
+    Create the unread counters of the users that have unread notifications.
+    """
+    Notification = apps.get_model("notification", "Notification")
+    UnreadCounter = apps.get_model("notification", "UnreadCounter")
+    schema_editor.execute(
+        f"INSERT INTO {UnreadCounter._meta.db_table} (user_id, unread) "
+        f"SELECT user_id, COUNT(*) FROM {Notification._meta.db_table} "
+        "WHERE is_read = %s GROUP BY user_id",
+        (False,),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notification', '0002_notification_campaign_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user'], name='notification_unread_idx'),
+        ),
+        migrations.RunPython(count_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
 
+from notification.manager import NotificationQuerySet, adjust_unread_counts
+
 
 User = get_user_model()
 
@@ -13,6 +17,86 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField()
+    # set for notifications sent by a fan-out, a retried campaign skips users it already reached
+    campaign_id = models.CharField(max_length=64, null=True, blank=True)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campaign_id", "user"],
+                condition=models.Q(campaign_id__isnull=False),
+                name="notification_unique_campaign_user",
+            ),
+        ]
+        indexes = [
+            # only unread rows are indexed, they are the ones badges and lists look for
+            models.Index(fields=["user"], condition=models.Q(is_read=False), name="notification_unread_idx"),
+        ]
+
+    def stored_state(self, using):
+        """
+        Lock the stored row and return its read state and user, None if it does not exist.
+
+        The counter deltas are taken from the database, not from the state
+        this instance was loaded with, so concurrent writers cannot apply the
+        same change twice.
+        """
+        if self.pk is None:
+            return None
+        return (
+            type(self)._base_manager.using(using).select_for_update()
+            .filter(pk=self.pk).values_list("is_read", "user_id").first()
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Save the notification and update the unread counters of its stored and new user.
+        """
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic(using=using):
+            stored = self.stored_state(using)
+            super().save(*args, **kwargs)
+            deltas = Counter()
+            if stored is None:
+                is_read, user_id = self.is_read, self.user_id
+            else:
+                stored_is_read, stored_user_id = stored
+                # fields left out of update_fields keep their stored value
+                saved = None if update_fields is None else set(update_fields)
+                is_read = self.is_read if saved is None or "is_read" in saved else stored_is_read
+                user_id = self.user_id if saved is None or saved & {"user", "user_id"} else stored_user_id
+                if not stored_is_read:
+                    deltas[stored_user_id] -= 1
+            if not is_read:
+                deltas[user_id] += 1
+            adjust_unread_counts(deltas, using)
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the notification and update the unread counter of its user.
+        """
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            stored = self.stored_state(using)
+            result = super().delete(*args, **kwargs)
+            # a notification deleted concurrently is not counted again
+            if stored is not None and not stored[0]:
+                adjust_unread_counts({stored[1]: -1}, using)
+        return result
+
+    def __str__(self):
+        return f"notification {self.user.username}"
+
+
+class UnreadCounter(models.Model):
+    """
+    UnreadCounter stores the number of unread notifications of a user
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="unread_counter")
+    unread = models.IntegerField(default=0)
 
     def __str__(self):
-        return f"notification {self.user.username}"
\ No newline at end of file
+        return f"unread {self.unread}"
\ No newline at end of file
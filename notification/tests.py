@@ -1,3 +1,183 @@
+"""
+Test the notification fan-out
+"""
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, DatabaseError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django.contrib.auth import get_user_model
+
+from notification.fanout import fan_out, fan_out_in_background, get_progress, iter_pk_ranges
+from notification.models import Notification
+
+User = get_user_model()
+
+
+class TestFanOut(TestCase):
+    """
+    Test sending one notification to many users
+    """
+    def setUp(self):
+        User.objects.bulk_create([
+            User(
+                email=f"fanout{index}@example.com",
+                username=f"fanout{index}",
+                full_name="Fan Out",
+                date_of_birth="1990-01-01",
+                phone_number="+9779841234567",
+                is_active=index % 5 != 0,
+            )
+            for index in range(25)
+        ])
+
+    def test_pk_ranges(self):
+        # one keyset query per range
+        with self.assertNumQueries(3):
+            ranges = list(iter_pk_ranges(User.objects.all(), 10))
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(len(list(iter_pk_ranges(User.objects.all(), 5))), 5)
+        self.assertEqual(
+            [User.objects.filter(pk__gt=start, pk__lte=end).count() for start, end in ranges],
+            [10, 10, 5],
+        )
+
+    def test_fan_out_segment(self):
+        batches = []
+        progress = fan_out("Hello", "campaign-1", segment="active", batch_size=7, report=batches.append)
+        self.assertEqual(Notification.objects.filter(campaign_id="campaign-1").count(), 20)
+        self.assertFalse(Notification.objects.filter(user__is_active=False).exists())
+        self.assertEqual((progress["users"], progress["inserted"], progress["batches"]), (20, 20, 3))
+        self.assertEqual([batch["users"] for batch in batches], [7, 14, 20])
+        self.assertTrue(get_progress("campaign-1")["done"])
+
+    def test_failed_background_fan_out_is_reported(self):
+        with mock.patch("notification.fanout.fan_out", side_effect=DatabaseError("connection lost")), \
+                self.assertLogs("notification.fanout", level="ERROR"):
+            fan_out_in_background("Hello", "campaign-failed").join()
+        progress = get_progress("campaign-failed")
+        self.assertTrue(progress["done"])
+        self.assertEqual(progress["error"], "connection lost")
+
+    def test_retry_is_idempotent(self):
+        fan_out("Hello", "campaign-1", users=User.objects.filter(pk__lte=User.objects.order_by("pk")[9].pk))
+        progress = fan_out("Hello", "campaign-1", users=User.objects.all(), batch_size=10)
+        self.assertEqual((progress["users"], progress["inserted"]), (25, 15))
+        self.assertEqual(Notification.objects.filter(campaign_id="campaign-1").count(), 25)
+        # another campaign reaches the same users again
+        fan_out("Hello again", "campaign-2")
+        self.assertEqual(Notification.objects.count(), 50)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("send_notification", "Maintenance tonight", "--campaign", "maintenance", "--batch-size", "10", stdout=out)
+        call_command("send_notification", "Maintenance tonight", "--campaign", "maintenance", stdout=out)
+        self.assertEqual(Notification.objects.filter(message_body="Maintenance tonight").count(), 25)
+        self.assertIn("sent 0 notifications to 25 users (25 already sent)", out.getvalue())
+
+
+class TestUnreadCounters(TestCase):
+    """
+    Test keeping the unread counters in sync
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="unread@example.com",
+            username="unread",
+            full_name="Unread User",
+            password="Password@123",
+            date_of_birth="1990-01-01",
+            phone_number="+9779841234567",
+        )
+        self.now = timezone.now()
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(user=self.user, message_body="Hello", timestamp=self.now, **kwargs)
+
+    def assertUnread(self, expected):
+        self.assertEqual(Notification.objects.unread_count(self.user), expected)
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), expected)
+
+    def test_single_writes(self):
+        self.assertUnread(0)
+        first = self.notify()
+        self.notify(is_read=True)
+        self.assertUnread(1)
+        first.is_read = True
+        first.save()
+        self.assertUnread(0)
+        first = Notification.objects.get(pk=first.pk)
+        first.is_read = False
+        first.save()
+        self.assertUnread(1)
+        first.delete()
+        self.assertUnread(0)
+
+    def test_bulk_writes(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, message_body="Hello", timestamp=self.now, is_read=index % 3 == 0)
+            for index in range(9)
+        ])
+        self.assertUnread(6)
+        Notification.objects.filter(pk__in=Notification.objects.order_by("pk").values("pk")[:4]).update(is_read=True)
+        self.assertUnread(4)
+        Notification.objects.filter(is_read=True).update(is_read=False)
+        self.assertUnread(9)
+        Notification.objects.filter(pk__in=Notification.objects.order_by("pk").values("pk")[:2]).delete()
+        self.assertUnread(7)
+
+    def test_stale_instances_apply_once(self):
+        pk = self.notify().pk
+        self.notify()
+        first, second = Notification.objects.get(pk=pk), Notification.objects.get(pk=pk)
+        first.is_read = True
+        first.save()
+        second.is_read = True
+        second.save()
+        self.assertUnread(1)
+        first = Notification.objects.get(pk=pk)
+        first.is_read = False
+        second.delete()
+        first.delete()
+        self.assertUnread(1)
+
+    def test_moving_to_another_user(self):
+        other = User.objects.create_user(
+            email="other@example.com",
+            username="other",
+            full_name="Other User",
+            password="Password@123",
+            date_of_birth="1990-01-01",
+            phone_number="+9779841234567",
+        )
+        moved = self.notify()
+        self.notify()
+        moved.user = other
+        moved.save(update_fields=["user"])
+        self.assertUnread(1)
+        self.assertEqual(Notification.objects.unread_count(other), 1)
+        Notification.objects.filter(user=other).update(user=self.user)
+        self.assertUnread(2)
+        self.assertEqual(Notification.objects.unread_count(other), 0)
+
+    def test_fan_out_counts(self):
+        self.notify()
+        fan_out("Hello", "campaign-1")
+        self.assertUnread(2)
+        # a retried campaign inserts nothing and counts nothing
+        fan_out("Hello", "campaign-1")
+        self.assertUnread(2)
 
-# Create your tests here.
+    def test_mark_all_read_in_batches(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, message_body="Hello", timestamp=self.now) for _ in range(7)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Notification.objects.mark_all_read(self.user, batch_size=3), 7)
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "notification_notification"')]
+        self.assertEqual(len(updates), 3)
+        self.assertUnread(0)
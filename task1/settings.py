@@ -147,3 +147,48 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "account.NewUser"
+
+# Number of rows copied per batch by the account data migrations
+USER_MIGRATION_BATCH_SIZE = int(os.environ.get("USER_MIGRATION_BATCH_SIZE", 1000))
+
+# Mirror writes on the legacy account.User table into account.NewUser
+USER_DUAL_WRITE = os.environ.get("USER_DUAL_WRITE", "False") == "True"
+
+# Directory for the JSON summaries of instrumented data migrations (disabled when empty)
+MIGRATION_METRICS_DIR = os.environ.get("MIGRATION_METRICS_DIR")
+
+# Cache shared by all processes, locmem stands in for Redis
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Cached user lookups: seconds in the shared cache, seconds and entries in the in-process LRU
+USER_CACHE_TIMEOUT = int(os.environ.get("USER_CACHE_TIMEOUT", 300))
+USER_CACHE_LOCAL_TTL = int(os.environ.get("USER_CACHE_LOCAL_TTL", 30))
+USER_CACHE_LOCAL_SIZE = int(os.environ.get("USER_CACHE_LOCAL_SIZE", 1024))
+
+# buffered activity writer, see account/activity.py
+ACTIVITY_BUFFER_SIZE = int(os.environ.get("ACTIVITY_BUFFER_SIZE", 10000))
+ACTIVITY_FLUSH_SIZE = int(os.environ.get("ACTIVITY_FLUSH_SIZE", 500))
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get("ACTIVITY_FLUSH_INTERVAL", 2.0))
+ACTIVITY_ENQUEUE_TIMEOUT = float(os.environ.get("ACTIVITY_ENQUEUE_TIMEOUT", 0.05))
+ACTIVITY_BACKGROUND_WRITER = os.environ.get("ACTIVITY_BACKGROUND_WRITER", "True") == "True"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "account.migrations": {
+            "handlers": ["console"],
+            "level": os.environ.get("MIGRATION_LOG_LEVEL", "INFO"),
+        },
+    },
+}